@@ -0,0 +1,33 @@
+# --- nlp_models.py (shared spaCy pipelines: loaded once per process, on first use) ---
+
+import threading
+
+DEFAULT_MODEL = "en_core_web_lg"
+UNUSED_PIPES = ("tagger", "parser", "attribute_ruler", "lemmatizer")  # only entities are used here; never loaded
+
+# Pipes each kind of caller needs; everything else is skipped for that call
+ENTITY_PIPES = ("ner",)  # doc.ents (ner has its own tok2vec)
+
+_MODELS = {}
+_LOCK = threading.Lock()
+
+def get_nlp(name=DEFAULT_MODEL):
+    """The spaCy pipeline `name`, loaded the first time anyone asks for it and shared afterwards."""
+    nlp = _MODELS.get(name)
+    if nlp is None:
+        with _LOCK:
+            nlp = _MODELS.get(name)
+            if nlp is None:
+                import spacy  # importing spaCy alone costs about a second; only pay it when a model is needed
+                nlp = _MODELS[name] = spacy.load(name, exclude=list(UNUSED_PIPES))
+    return nlp
+
+def skipped_pipes(nlp, keep):
+    return [pipe for pipe in nlp.pipe_names if pipe not in keep]
+
+def parse(text, keep=None, name=DEFAULT_MODEL):
+    """Run text through the shared pipeline with only the `keep` pipes enabled (all of them if None)."""
+    nlp = get_nlp(name)
+    if keep is None:
+        return nlp(text)
+    return nlp(text, disable=skipped_pipes(nlp, keep))
@@ -1,13 +1,11 @@
-import spacy
 import pyap  # Extracts addresses
 import phonenumbers  # Extracts phone numbers
 from thefuzz import fuzz  # Fuzzy matching for company names
 import regex  # Advanced regex handling for legal text
 from email_validator import validate_email, EmailNotValidError  # Validates and extracts emails
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer  # Sentiment Analysis
+from modules.nlp_models import parse, ENTITY_PIPES  # Shared spaCy model, loaded on first use
 
-# Load NLP Model
-nlp = spacy.load("en_core_web_lg")
 sentiment_analyzer = SentimentIntensityAnalyzer()  # Load Sentiment Model
 
 # Define financial, regulatory, and risk terms
@@ -57,14 +55,16 @@ def extract_cik_numbers(text):
     """Extracts SEC CIK Numbers (unique identifier for publicly traded companies)."""
     return regex.findall(r"CIK\s*(\d{10})", text)
 
-def extract_company_names(text):
+def extract_company_names(text, doc=None):
     """Extracts company names using spaCy NLP model."""
-    doc = nlp(text)
+    if doc is None:
+        doc = parse(text, keep=ENTITY_PIPES)
     return list(set(ent.text for ent in doc.ents if ent.label_ == "ORG"))
 
-def extract_person_names(text):
+def extract_person_names(text, doc=None):
     """Extracts names of people from the document (CEOs, executives, legal figures)."""
-    doc = nlp(text)
+    if doc is None:
+        doc = parse(text, keep=ENTITY_PIPES)
     return list(set(ent.text for ent in doc.ents if ent.label_ == "PERSON"))
 
 def extract_financial_terms(text):
@@ -101,9 +101,10 @@ def analyze_sentiment(text):
 
 def extract_entities(text):
     """Extracts structured data from text for crypto due diligence analysis."""
+    doc = parse(text, keep=ENTITY_PIPES)  # one spaCy pass for both entity types
     extracted_data = {
-        "company_names": extract_company_names(text),
-        "person_names": extract_person_names(text),
+        "company_names": extract_company_names(text, doc),
+        "person_names": extract_person_names(text, doc),
         "emails": extract_emails(text),
         "phone_numbers": extract_phone_numbers(text),
         "websites": extract_websites(text),
@@ -2,11 +2,16 @@ import fitz  # PyMuPDF for digital PDFs
 import pytesseract  # OCR for scanned PDFs
 from pdf2image import convert_from_path  # Convert scanned PDFs to images
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 # Set Tesseract OCR path (Windows users may need to change this)
 # Uncomment & modify the below line if Tesseract isn't detected automatically
 # pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
+# OCR settings
+OCR_DPI = int(os.environ.get("OCR_DPI", 200))  # pdf2image's default resolution
+OCR_MAX_WORKERS = os.cpu_count() or 1
+
 def extract_text_from_digital_pdf(pdf_path):
     """
     Extracts text from a digital (non-scanned) PDF using PyMuPDF.
@@ -22,18 +27,32 @@ def extract_text_from_digital_pdf(pdf_path):
     return text.strip()
 
 
-def extract_text_from_scanned_pdf(pdf_path):
+def ocr_page(pdf_path, page_number, dpi=OCR_DPI):
+    """
+    Renders a single page (1-based) and runs OCR on it, so only one page image is in memory.
+    :return: Extracted text of that page
     """
-    Extracts text from a scanned PDF using OCR (Tesseract).
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    return pytesseract.image_to_string(images[0]) if images else ""
+
+
+def extract_text_from_scanned_pdf(pdf_path, dpi=OCR_DPI, max_workers=OCR_MAX_WORKERS):
+    """
+    Extracts text from a scanned PDF using OCR (Tesseract), one page per worker process.
     :param pdf_path: Path to the PDF file
-    :return: Extracted text as a string
+    :return: Extracted text as a string, pages in document order
     """
-    images = convert_from_path(pdf_path)
-    extracted_text = ""
+    with fitz.open(pdf_path) as doc:
+        page_numbers = list(range(1, doc.page_count + 1))
 
-    for image in images:
-        extracted_text += pytesseract.image_to_string(image) + "\n"
+    workers = max(1, min(max_workers, len(page_numbers)))
+    if workers == 1:
+        page_texts = [ocr_page(pdf_path, n, dpi) for n in page_numbers]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            page_texts = list(pool.map(ocr_page, [pdf_path] * len(page_numbers), page_numbers, [dpi] * len(page_numbers)))
 
+    extracted_text = "".join(page_text + "\n" for page_text in page_texts)
     return extracted_text.strip()
 
 
@@ -1,20 +1,16 @@
-import spacy
 import re
 import json
 import tiktoken
-import ollama  # ✅ Use Ollama API for Nomic embedding
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from modules.vector_database import save_to_faiss  # FAISS Vector Database Storage
-
-# Load NLP Model
-nlp = spacy.load("en_core_web_lg")
+from modules.vector_database import save_to_faiss, generate_embeddings  # FAISS Vector Database Storage
+from modules.nlp_models import parse, ENTITY_PIPES  # Shared spaCy model, loaded on first use
 
 # Define important entities to preserve
 IMPORTANT_ENTITIES = {"ORG", "GPE", "MONEY", "LAW", "EVENT", "DATE", "PRODUCT", "PERCENT", "CARDINAL"}
 
 def extract_important_phrases(text):
     """Extracts key entities (company names, laws, financial data) to avoid splitting them."""
-    doc = nlp(text)
+    doc = parse(text, keep=ENTITY_PIPES)
     return {ent.text for ent in doc.ents if ent.label_ in IMPORTANT_ENTITIES}
 
 def count_tokens(text):
@@ -39,8 +35,7 @@ def preprocess_text(text):
 
 def get_embedding(text):
     """Generates embeddings using the locally installed Nomic Embed model via Ollama."""
-    response = ollama.embeddings(model="nomic-embed-text", prompt=text)  # ✅ FIXED
-    return response["embedding"]  # ✅ Extract embedding
+    return generate_embeddings([text])[0].tolist()
 
 def smart_chunk_text(text, max_tokens=600):
     """Splits text into meaningful sections while keeping chunks under the token limit."""
@@ -50,13 +45,14 @@ def smart_chunk_text(text, max_tokens=600):
 
     chunks = []
     split_texts = splitter.split_text(text)
+    embeddings = generate_embeddings(split_texts)  # ✅ One batched Ollama call per 64 chunks
 
     for i, chunk in enumerate(split_texts):
         chunks.append({
             "chunk_id": i + 1,
             "text": chunk,
             "tokens": count_tokens(chunk),
-            "embedding": get_embedding(chunk)  # ✅ Call Ollama for embedding
+            "embedding": embeddings[i].tolist()
         })
 
     return chunks
@@ -1,10 +1,6 @@
 import re
 import unicodedata
-import spacy
-
-# Load spaCy's stop words
-nlp = spacy.load("en_core_web_sm")
-STOP_WORDS = nlp.Defaults.stop_words
+from spacy.lang.en.stop_words import STOP_WORDS  # spaCy's English stop words, no model needed
 
 def clean_text(text):
     """
@@ -5,15 +5,29 @@ import ollama  # ✅ Using Ollama for embeddings & chat response
 
 VECTOR_SIZE = 768  # Nomic embedding output size
 
+EMBED_BATCH_SIZE = 64  # Texts per Ollama /api/embed request
+
+def generate_embeddings(texts):
+    """Generates Nomic embeddings for a list of texts in batched Ollama requests (float32 matrix)."""
+    texts = list(texts)
+    embeddings = np.empty((len(texts), VECTOR_SIZE), dtype=np.float32)
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        batch = texts[start:start + EMBED_BATCH_SIZE]
+        response = ollama.embed(model="nomic-embed-text", input=batch)  # ✅ List input, one request per batch
+        embeddings[start:start + len(batch)] = response["embeddings"]
+    return embeddings
+
 def generate_embedding(text):
     """Generates Nomic embeddings using Ollama."""
-    response = ollama.embeddings(model="nomic-embed-text", prompt=text)  # ✅ Ensure input is a string
- # ✅ Ensure input is a list
-    return response["embedding"]
+    return generate_embeddings([text])[0]
 
 def save_to_faiss(chunks, index_path="test_pdfs/extracted/embeddings.index"):
     """Stores chunk embeddings in a FAISS vector database."""
-    embeddings = np.array([generate_embedding(chunk["text"]) for chunk in chunks], dtype=np.float32)
+    embeddings = np.array(
+        [chunk["embedding"] for chunk in chunks] if all("embedding" in chunk for chunk in chunks)
+        else generate_embeddings(chunk["text"] for chunk in chunks),
+        dtype=np.float32
+    )  # ✅ Reuse embeddings already computed by the chunker
 
     # ✅ Ensure correct FAISS index handling
     index = faiss.IndexFlatL2(VECTOR_SIZE)
@@ -37,7 +51,7 @@ def search_faiss(query, k=5, index_path="test_pdfs/extracted/embeddings.index"):
     index = load_faiss_index(index_path)
 
     # ✅ Fix query embedding issue
-    query_embedding = np.array(generate_embedding(query), dtype=np.float32).reshape(1, -1)
+    query_embedding = generate_embedding(query).reshape(1, -1)
 
     # ✅ Fix FAISS search dimension mismatch
     if index.ntotal == 0:
@@ -0,0 +1,129 @@
+# --- disk_cache.py (persistent SQLite key/value cache with LRU and TTL eviction) ---
+
+import os
+import time
+import sqlite3
+import threading
+
+class DiskCache:
+    """
+    Small content-addressed cache stored in one SQLite file.
+    Values are raw bytes; the least recently used entries are evicted once
+    the cache grows past max_entries, and entries older than ttl seconds (if set)
+    are treated as misses. Safe to share between threads and processes.
+    """
+
+    def __init__(self, path, max_entries=200_000, ttl=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._writes_since_evict = 0
+
+    # --- Connection (opened lazily so importing a module never touches the disk) ---
+    def _connect(self):
+        if self._conn is not None and self._pid != os.getpid():
+            self._conn = None  # forked worker: never reuse the parent's SQLite connection
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, last_access REAL NOT NULL, "
+                "created_at REAL NOT NULL DEFAULT 0)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+            if "created_at" not in columns:  # cache files written before TTL support
+                conn.execute("ALTER TABLE cache ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_last_access ON cache(last_access)")
+            self._conn = conn
+            self._pid = os.getpid()
+        return self._conn
+
+    def _oldest_valid(self, now):
+        return now - self.ttl if self.ttl else 0
+
+    # --- Reads ---
+    def get_many(self, keys):
+        """Return {key: value} for the live keys present in the cache (and refresh their LRU position)."""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            for start in range(0, len(keys), 500):  # stay under SQLite's bound-parameter limit
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, value FROM cache WHERE key IN ({placeholders}) AND created_at >= ?",
+                    batch + [self._oldest_valid(now)]
+                )
+                found.update(rows.fetchall())
+            if found:
+                conn.executemany("UPDATE cache SET last_access = ? WHERE key = ?", [(now, k) for k in found])
+                conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    # --- Writes ---
+    def set_many(self, items):
+        items = list(items)
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache (key, value, last_access, created_at) VALUES (?, ?, ?, ?)",
+                [(k, v, now, now) for k, v in items]
+            )
+            conn.commit()
+            self._writes_since_evict += len(items)
+            if self._writes_since_evict >= max(1, self.max_entries // 100):
+                self._evict(conn)
+
+    def set(self, key, value):
+        self.set_many([(key, value)])
+
+    def _evict(self, conn):
+        """Drop expired entries, then the least recently used entries beyond max_entries."""
+        self._writes_since_evict = 0
+        if self.ttl:
+            conn.execute("DELETE FROM cache WHERE created_at < ?", (self._oldest_valid(time.time()),))
+        (count,) = conn.execute("SELECT COUNT(*) FROM cache").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY last_access ASC LIMIT ?)",
+                (excess,)
+            )
+        conn.commit()
+
+    # --- Maintenance / metrics ---
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache")
+            conn.commit()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            (count,) = self._connect().execute("SELECT COUNT(*) FROM cache").fetchone()
+        total = self.hits + self.misses
+        return {
+            "entries": count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
@@ -0,0 +1,77 @@
+# --- embedding_client.py (shared batched Ollama embedding client with on-disk cache) ---
+
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import ollama
+from lib.disk_cache import DiskCache
+
+# --- Config ---
+EMBED_MODEL = "nomic-embed-text"
+BATCH_SIZE = 64               # texts per /api/embed request
+MAX_CONCURRENT_REQUESTS = 4   # in-flight requests against the Ollama server
+CACHE_PATH = "data/cache/embeddings.sqlite"
+CACHE_MAX_ENTRIES = 500_000   # ~1.5 GB of 768-dim float32 vectors
+
+_CACHE = DiskCache(CACHE_PATH, max_entries=CACHE_MAX_ENTRIES)
+
+def cache_key(text, model=EMBED_MODEL):
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+def embedding_cache_stats():
+    """Hit/miss counters for this process plus the number of cached vectors."""
+    return _CACHE.stats()
+
+def _embed_batch(texts, model):
+    response = ollama.embed(model=model, input=texts)
+    return response["embeddings"]
+
+def _embed_uncached(texts, model, batch_size, max_workers):
+    starts = list(range(0, len(texts), batch_size))
+    batches = [texts[start:start + batch_size] for start in starts]
+    matrix = None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as pool:
+        for start, vectors in zip(starts, pool.map(lambda batch: _embed_batch(batch, model), batches)):
+            block = np.asarray(vectors, dtype="float32")
+            if matrix is None:
+                matrix = np.empty((len(texts), block.shape[1]), dtype="float32")
+            matrix[start:start + len(block)] = block
+
+    return matrix
+
+def embed_texts(texts, model=EMBED_MODEL, batch_size=BATCH_SIZE, max_workers=MAX_CONCURRENT_REQUESTS, use_cache=True):
+    """
+    Embed a list of strings with batched, concurrent Ollama requests.
+    Previously seen (model, text) pairs are served from the on-disk cache; duplicate
+    texts within one call are embedded once.
+    Returns a contiguous float32 matrix of shape (len(texts), dim), rows in input order.
+    """
+    texts = list(texts)
+    if not texts:
+        return np.empty((0, 0), dtype="float32")
+    if not use_cache:
+        return _embed_uncached(texts, model, batch_size, max_workers)
+
+    keys = [cache_key(text, model) for text in texts]
+    cached = _CACHE.get_many(keys)
+
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in cached and key not in missing:
+            missing[key] = text
+
+    vectors = {key: np.frombuffer(blob, dtype="float32") for key, blob in cached.items()}
+    if missing:
+        fresh = _embed_uncached(list(missing.values()), model, batch_size, max_workers)
+        _CACHE.set_many((key, row.tobytes()) for key, row in zip(missing, fresh))
+        vectors.update(zip(missing, fresh))
+
+    matrix = np.empty((len(texts), len(next(iter(vectors.values())))), dtype="float32")
+    for i, key in enumerate(keys):
+        matrix[i] = vectors[key]
+    return matrix
+
+def embed_text(text, model=EMBED_MODEL, use_cache=True):
+    """Embed a single string; returns a float32 vector of shape (dim,)."""
+    return embed_texts([text], model=model, use_cache=use_cache)[0]
@@ -0,0 +1,188 @@
+# --- graph_store.py (concept graph as memory-mapped NumPy arrays) ---
+#
+# Every save writes a new version directory under GRAPH_DIR and then points CURRENT at it:
+#   meta.json                          counts
+#   adj_indptr/indices/weights.npy     symmetric chunk-chunk CSR adjacency, each row strongest edge first
+#   concept_indptr/indices.npy         chunk -> concept CSR incidence
+#   node_ids, texts, concepts          string tables: <name>.bin (UTF-8 blob) + <name>_offsets.npy
+# Node ids are stored sorted, so a chunk id is found by binary search without loading every id.
+# Arrays are opened with mmap_mode="r": opening is instant and only the pages that are read are loaded.
+# Files are never rewritten in place, so readers that still map an older version are unaffected
+# (Windows refuses to replace a mapped file).
+
+import os
+import json
+import time
+import shutil
+import numpy as np
+
+GRAPH_DIR = "data/graph/"
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+
+# --- String tables ---
+class StringTable:
+    """Read-only list of strings backed by a UTF-8 blob and an offsets array."""
+
+    def __init__(self, blob, offsets):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+def _save_strings(path, name, strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(os.path.join(path, name + ".bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    _save_array(path, name + "_offsets", offsets)
+
+def _load_strings(path, name):
+    blob_path = os.path.join(path, name + ".bin")
+    offsets = _load_array(path, name + "_offsets")
+    if offsets[-1] == 0:  # np.memmap cannot map an empty file
+        return StringTable(b"", offsets)
+    return StringTable(np.memmap(blob_path, dtype=np.uint8, mode="r"), offsets)
+
+# --- Array files ---
+def _save_array(path, name, array):
+    np.save(os.path.join(path, name + ".npy"), array)
+
+def _load_array(path, name):
+    return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+# --- Query API ---
+class GraphStore:
+    def __init__(self, path, meta):
+        self.path = path
+        self.meta = meta
+        self.adj_indptr = _load_array(path, "adj_indptr")
+        self.adj_indices = _load_array(path, "adj_indices")
+        self.adj_weights = _load_array(path, "adj_weights")
+        self.concept_indptr = _load_array(path, "concept_indptr")
+        self.concept_indices = _load_array(path, "concept_indices")
+        self.node_ids = _load_strings(path, "node_ids")
+        self.texts = _load_strings(path, "texts")
+        self.concept_names = _load_strings(path, "concepts")
+
+    @property
+    def n_nodes(self):
+        return self.meta["n_nodes"]
+
+    @property
+    def n_edges(self):
+        return self.meta["n_edges"]
+
+    def index_of(self, chunk_id):
+        """Row of chunk_id, or -1 if it is not in the graph."""
+        lo, hi = 0, self.n_nodes
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.node_ids[mid] < chunk_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self.n_nodes and self.node_ids[lo] == chunk_id else -1
+
+    def text(self, i):
+        return self.texts[i]
+
+    def concepts(self, i):
+        lo, hi = self.concept_indptr[i], self.concept_indptr[i + 1]
+        return [self.concept_names[j] for j in self.concept_indices[lo:hi]]
+
+    def neighbours(self, i, limit=None):
+        """(neighbour rows, edge weights) of row i, strongest first."""
+        lo, hi = self.adj_indptr[i], self.adj_indptr[i + 1]
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return self.adj_indices[lo:hi], self.adj_weights[lo:hi]
+
+    def neighbours_of(self, chunk_id, limit=None):
+        """[(neighbour chunk_id, weight), ...] strongest first; empty if chunk_id is not in the graph."""
+        i = self.index_of(chunk_id)
+        if i < 0:
+            return []
+        rows, weights = self.neighbours(i, limit)
+        return [(self.node_ids[j], float(w)) for j, w in zip(rows, weights)]
+
+    def degrees(self):
+        return np.diff(self.adj_indptr)
+
+    def edges(self):
+        """(rows, cols, weights) of every edge once (row < col)."""
+        rows = np.repeat(np.arange(self.n_nodes), self.degrees())
+        upper = rows < self.adj_indices
+        return rows[upper], np.asarray(self.adj_indices)[upper], np.asarray(self.adj_weights)[upper]
+
+# --- Save / load ---
+def graph_version(graph_dir=GRAPH_DIR):
+    """Name of the current graph version (changes on every save), or None if there is no graph."""
+    try:
+        with open(os.path.join(graph_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+def save_graph(node_ids, texts, incidence, concepts, adjacency, graph_dir=GRAPH_DIR):
+    """
+    Write a new version of the graph and make it current. node_ids must be sorted; texts and the
+    rows of the chunk x concept `incidence` and symmetric `adjacency` (SciPy CSR) follow the same order.
+    """
+    if list(node_ids) != sorted(node_ids):
+        raise ValueError("❌ Graph node ids must be sorted.")
+    version = f"v{time.time_ns()}"
+    path = os.path.join(graph_dir, version)
+    os.makedirs(path)
+
+    # Order each adjacency row strongest edge first, so the top neighbours are a prefix
+    adjacency = adjacency.tocsr()
+    rows = np.repeat(np.arange(adjacency.shape[0]), np.diff(adjacency.indptr))
+    order = np.lexsort((-adjacency.data, rows))
+
+    _save_array(path, "adj_indptr", adjacency.indptr.astype(np.int64))
+    _save_array(path, "adj_indices", adjacency.indices[order].astype(np.int32))
+    _save_array(path, "adj_weights", adjacency.data[order].astype(np.float32))
+    _save_array(path, "concept_indptr", incidence.indptr.astype(np.int64))
+    _save_array(path, "concept_indices", incidence.indices.astype(np.int32))
+    _save_strings(path, "node_ids", node_ids)
+    _save_strings(path, "texts", texts)
+    _save_strings(path, "concepts", concepts)
+    with open(os.path.join(path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"n_nodes": len(node_ids), "n_edges": int(adjacency.nnz // 2), "n_concepts": len(concepts)}, f)
+
+    # Switch CURRENT atomically, then drop older versions nobody can still be opening
+    current_path = os.path.join(graph_dir, CURRENT_FILE)
+    with open(current_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(current_path + ".tmp", current_path)
+    for name in os.listdir(graph_dir):
+        if name != version and name.startswith("v"):
+            shutil.rmtree(os.path.join(graph_dir, name), ignore_errors=True)  # still mapped on Windows: removed next time
+
+def clear_graph(graph_dir=GRAPH_DIR):
+    """Remove the graph: CURRENT first, so readers see no graph, then every version directory."""
+    try:
+        os.remove(os.path.join(graph_dir, CURRENT_FILE))
+    except FileNotFoundError:
+        pass
+    if not os.path.isdir(graph_dir):
+        return
+    for name in os.listdir(graph_dir):
+        if name.startswith("v"):
+            shutil.rmtree(os.path.join(graph_dir, name), ignore_errors=True)  # still mapped on Windows: removed on the next save or clear
+
+def load_graph(graph_dir=GRAPH_DIR):
+    """Open the current graph, or return None if there is none."""
+    version = graph_version(graph_dir)
+    if version is None:
+        return None
+    path = os.path.join(graph_dir, version)
+    with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    return GraphStore(path, meta)
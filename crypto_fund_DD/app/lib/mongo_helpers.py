@@ -1,14 +1,28 @@
 
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, UpdateOne
+from bson.binary import Binary
 from datetime import datetime
+import uuid
+import numpy as np
 import json  # ✅ REQUIRED for loading the question bank file
 
 # Connect to local MongoDB (Compass)
 client = MongoClient("mongodb://localhost:27017/")
 db = client["crypto_dd"]
 funds_collection = db["funds"]
+# One document per chunk: {fund_name, chunk_idx, text, token_count, embedding}
+chunks_collection = db["chunks"]
+# One document per extracted page: {fund_name, page, text}
+pages_collection = db["pages"]
 
-def insert_fund_metadata(fund_name, file_name):
+# Embeddings are stored as packed little-endian blobs ("float16" halves the size)
+EMBEDDING_STORAGE_DTYPE = "float32"
+_CHUNK_INDEXES_READY = False
+_PAGE_INDEXES_READY = False
+INSERT_BATCH_SIZE = 500  # documents per insert_many when streaming pages/chunks in
+CHUNK_STAGING_PREFIX = "__staging__/"  # fund_name of chunks being written, until they replace the fund's chunks
+
+def insert_fund_metadata(fund_name, file_name, content_hash=None):
     # Check if fund already exists
     existing = funds_collection.find_one({"fund_name": fund_name})
     if existing:
@@ -20,8 +34,9 @@ def insert_fund_metadata(fund_name, file_name):
         "fund_name": fund_name,
         "uploaded_at": datetime.utcnow(),
         "file_name": file_name,
+        "content_hash": content_hash,  # sha256 of the uploaded bytes
         "raw_text": None,
-        "cleaned_chunks": [],
+        "chunk_count": 0,
         "qa_results": [],
         "risk_score": {},
         "pptx_path": None
@@ -44,9 +59,31 @@ def append_qa_result(fund_name, question, answer):
     )
     return result.modified_count
 
+def upsert_qa_result(fund_name, question, answer):
+    """Like append_qa_result, but replaces the answer if the question is already stored (safe to repeat)."""
+    result = funds_collection.update_one(
+        {"fund_name": fund_name, "qa_results.question": question},
+        {"$set": {"qa_results.$.answer": answer}}
+    )
+    if result.matched_count:
+        return result.modified_count
+    result = funds_collection.update_one(
+        {"fund_name": fund_name, "qa_results.question": {"$ne": question}},
+        {"$push": {"qa_results": {"question": question, "answer": answer}}}
+    )
+    return result.modified_count
+
 def get_fund_by_name(fund_name):
     return funds_collection.find_one({"fund_name": fund_name})
 
+def _extracted_filter():
+    # page_count is set once a fund's pages are stored; older funds kept the whole raw_text instead
+    return {"$or": [{"page_count": {"$exists": True}}, {"raw_text": {"$ne": None}}]}
+
+def find_fund_by_content_hash(content_hash):
+    """Fund whose document with exactly these bytes was already extracted (None if not ingested yet)."""
+    return funds_collection.find_one({"content_hash": content_hash, **_extracted_filter()})
+
 def save_question_bank(filepath="data/question_bank.json"):
     with open(filepath, "r", encoding="utf-8") as f:
         questions = json.load(f)
@@ -56,25 +93,211 @@ def save_question_bank(filepath="data/question_bank.json"):
 
 def load_question_bank():
     return list(db.question_bank.find({}, {"_id": 0}))
-def get_all_funds_with_raw_text():
-    return list(funds_collection.find(
-        {"raw_text": {"$exists": True, "$ne": None}},
-        {"fund_name": 1, "raw_text": 1}
+def _fund_name_filter(query, fund_names):
+    if fund_names is not None:
+        query["fund_name"] = {"$in": list(fund_names)}
+    return query
+
+def get_extracted_fund_names(fund_names=None):
+    docs = funds_collection.find(_fund_name_filter(_extracted_filter(), fund_names), {"_id": 0, "fund_name": 1})
+    return [doc["fund_name"] for doc in docs]
+
+def _insert_in_batches(collection, docs):
+    batch, count = [], 0
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= INSERT_BATCH_SIZE:
+            collection.insert_many(batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(batch)
+        count += len(batch)
+    return count
+
+# --- Pages collection ---
+def ensure_page_indexes():
+    global _PAGE_INDEXES_READY
+    if not _PAGE_INDEXES_READY:
+        pages_collection.create_index([("fund_name", ASCENDING), ("page", ASCENDING)], unique=True)
+        _PAGE_INDEXES_READY = True
+
+def replace_fund_pages(fund_name, pages):
+    """
+    Replace a fund's extracted raw text with an iterable of (page_number, text), inserted in
+    batches as it is consumed. The fund-level raw_text copy is dropped. Returns the page count.
+    """
+    ensure_page_indexes()
+    pages_collection.delete_many({"fund_name": fund_name})
+    count = _insert_in_batches(pages_collection, (
+        {"fund_name": fund_name, "page": page, "text": text} for page, text in pages
     ))
-def get_all_funds_with_chunks():
-    return list(funds_collection.find({"cleaned_chunks": {"$exists": True, "$ne": []}}))
+    funds_collection.update_one(
+        {"fund_name": fund_name},
+        {"$set": {"page_count": count}, "$unset": {"raw_text": ""}}
+    )
+    return count
 
-def get_chunks_and_embeddings(fund_name):
-    doc = funds_collection.find_one(
+def iter_fund_pages(fund_name):
+    """Yield (page_number, raw text) in page order from a cursor; legacy funds yield their raw_text as page 1."""
+    found = False
+    cursor = pages_collection.find({"fund_name": fund_name}, {"_id": 0, "page": 1, "text": 1}).sort("page", ASCENDING)
+    for doc in cursor:
+        found = True
+        yield doc["page"], doc["text"]
+    if not found:
+        doc = funds_collection.find_one({"fund_name": fund_name}, {"_id": 0, "raw_text": 1}) or {}
+        if doc.get("raw_text"):
+            yield 1, doc["raw_text"]
+
+def decode_embeddings(doc):
+    """Decode fund-level embeddings (packed blob or legacy list-of-lists) into a float32 (n, dim) array."""
+    raw = doc.get("embeddings")
+    if raw is None or len(raw) == 0:
+        return np.empty((0, doc.get("embedding_dim", 0)), dtype=np.float32)
+    if isinstance(raw, (bytes, bytearray)):
+        dtype = np.dtype(doc.get("embedding_dtype", "float32")).newbyteorder("<")
+        matrix = np.frombuffer(raw, dtype=dtype).reshape(-1, doc["embedding_dim"])
+        return matrix if dtype == np.float32 else matrix.astype(np.float32)
+    return np.asarray(raw, dtype=np.float32)  # legacy list-of-lists documents
+
+# --- Chunks collection ---
+def chunk_id(fund_name, chunk_idx):
+    """Id of a chunk outside MongoDB (FAISS index bookkeeping, concept graph nodes)."""
+    return f"{fund_name}_chunk_{chunk_idx + 1}"
+
+def ensure_chunk_indexes():
+    global _CHUNK_INDEXES_READY
+    if not _CHUNK_INDEXES_READY:
+        chunks_collection.create_index(
+            [("fund_name", ASCENDING), ("chunk_idx", ASCENDING)], unique=True
+        )
+        _CHUNK_INDEXES_READY = True
+
+def _staging_name(fund_name):
+    return f"{CHUNK_STAGING_PREFIX}{fund_name}"
+
+def replace_fund_chunks(fund_name, chunks):
+    """
+    Replace a fund's chunks with an iterable of {"text": ..., "token_count": ..., optional
+    "page_start"/"page_end"}, inserted in batches as it is consumed.
+    The new chunks are written under a staging name and only swapped in once the iterable is
+    exhausted, so a failure part-way keeps the fund's previous chunks.
+    Existing embeddings for the fund are dropped, since they no longer match.
+    """
+    ensure_chunk_indexes()
+    staging = _staging_name(fund_name)
+    chunks_collection.delete_many({"fund_name": staging})  # left over from a killed run
+    try:
+        count = _insert_in_batches(chunks_collection, (
+            {"fund_name": staging, "chunk_idx": i, **c} for i, c in enumerate(chunks)
+        ))
+    except BaseException:
+        chunks_collection.delete_many({"fund_name": staging})
+        raise
+
+    chunks_collection.delete_many({"fund_name": fund_name})
+    chunks_collection.update_many({"fund_name": staging}, {"$set": {"fund_name": fund_name}})
+    funds_collection.update_one(
+        {"fund_name": fund_name},
+        {"$set": {"chunk_count": count, "n_embeddings": 0},
+         "$unset": {"cleaned_chunks": "", "embeddings": "", "embeddings_version": ""}}
+    )
+    return count
+
+def get_fund_chunks(fund_name, fields=("text",)):
+    """Return a fund's chunk documents in order, projected to chunk_idx plus the requested fields."""
+    projection = {"_id": 0, "chunk_idx": 1, **{field: 1 for field in fields}}
+    return list(chunks_collection.find({"fund_name": fund_name}, projection).sort("chunk_idx", ASCENDING))
+
+def get_chunk_texts(fund_name):
+    texts = [c["text"] for c in get_fund_chunks(fund_name)]
+    if not texts:  # legacy fund documents that still embed their chunks
+        doc = funds_collection.find_one({"fund_name": fund_name}, {"_id": 0, "cleaned_chunks": 1}) or {}
+        texts = doc.get("cleaned_chunks", [])
+    return texts
+
+def get_fund_names_with_chunks(fund_names=None):
+    names = {name for name in chunks_collection.distinct("fund_name", _fund_name_filter({}, fund_names))
+             if not name.startswith(CHUNK_STAGING_PREFIX)}
+    legacy = funds_collection.find(
+        _fund_name_filter({"cleaned_chunks": {"$exists": True, "$ne": []}}, fund_names),
+        {"_id": 0, "fund_name": 1}
+    )
+    names.update(doc["fund_name"] for doc in legacy)
+    return sorted(names)
+
+def store_fund_embeddings(fund_name, embeddings):
+    """
+    Store one embedding per chunk (packed Binary on each chunk document) under a fresh
+    version id, returned so indexes can detect the change.
+    """
+    rows = np.ascontiguousarray(embeddings, dtype=np.dtype(EMBEDDING_STORAGE_DTYPE).newbyteorder("<"))
+    rows = rows.reshape(len(rows), -1)
+    ensure_chunk_indexes()
+    if not chunks_collection.count_documents({"fund_name": fund_name}, limit=1):
+        _migrate_legacy_chunks(fund_name)
+    if len(rows):
+        chunks_collection.bulk_write([
+            UpdateOne({"fund_name": fund_name, "chunk_idx": i}, {"$set": {"embedding": Binary(row.tobytes())}})
+            for i, row in enumerate(rows)
+        ], ordered=False)
+
+    version = uuid.uuid4().hex
+    funds_collection.update_one(
         {"fund_name": fund_name},
-        {"_id": 0, "cleaned_chunks": 1, "embeddings": 1}
+        {"$set": {
+            "embedding_dtype": EMBEDDING_STORAGE_DTYPE,
+            "embedding_dim": int(rows.shape[1]),
+            "n_embeddings": int(rows.shape[0]),
+            "embeddings_version": version,
+            "embeddings_updated_at": datetime.utcnow()
+        },
+         "$unset": {"embeddings": ""}}
     )
-    return doc.get("cleaned_chunks", []), doc.get("embeddings", [])
-def get_all_funds_with_embeddings():
-    return list(funds_collection.find({
-        "cleaned_chunks": {"$exists": True, "$ne": []},
-        "embeddings": {"$exists": True, "$ne": []}
-    }))
+    return version
+
+def _migrate_legacy_chunks(fund_name):
+    doc = funds_collection.find_one({"fund_name": fund_name}, {"_id": 0, "cleaned_chunks": 1}) or {}
+    texts = doc.get("cleaned_chunks", [])
+    if texts:
+        replace_fund_chunks(fund_name, [
+            {"text": t, "token_count": int(len(t.split()) * 1.3)} for t in texts
+        ])
+
+def get_chunks_and_embeddings(fund_name):
+    """Return (chunk texts, float32 (n, dim) matrix) reading only the text and embedding fields."""
+    meta = funds_collection.find_one(
+        {"fund_name": fund_name},
+        {"_id": 0, "embedding_dtype": 1, "embedding_dim": 1, "embeddings": 1, "cleaned_chunks": 1}
+    ) or {}
+    if "embeddings" in meta:  # legacy fund-level storage
+        return meta.get("cleaned_chunks", []), decode_embeddings(meta)
+
+    chunks = [c for c in get_fund_chunks(fund_name, fields=("text", "embedding")) if "embedding" in c]
+    texts = [c["text"] for c in chunks]
+    if not chunks:
+        return texts, np.empty((0, meta.get("embedding_dim", 0)), dtype=np.float32)
+    dtype = np.dtype(meta.get("embedding_dtype", "float32")).newbyteorder("<")
+    matrix = np.frombuffer(b"".join(c["embedding"] for c in chunks), dtype=dtype)
+    matrix = matrix.reshape(len(chunks), meta["embedding_dim"])
+    return texts, matrix if dtype == np.float32 else matrix.astype(np.float32)
+
+def get_embedding_versions():
+    """Lightweight {fund_name, embeddings_version, n_embeddings} listing (no chunk or vector payload)."""
+    return list(funds_collection.aggregate([
+        {"$match": {"$or": [
+            {"n_embeddings": {"$gt": 0}},
+            {"embeddings": {"$exists": True, "$ne": []}}
+        ]}},
+        {"$project": {
+            "_id": 0,
+            "fund_name": 1,
+            "embeddings_version": 1,
+            "n_embeddings": {"$cond": [{"$isArray": "$embeddings"}, {"$size": "$embeddings"}, "$n_embeddings"]}
+        }},
+        {"$sort": {"fund_name": 1}}
+    ]))
 def store_risk_scores(fund_name, risk_scores: dict):
     result = funds_collection.update_one(
         {"fund_name": fund_name},
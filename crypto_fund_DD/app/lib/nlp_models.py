@@ -0,0 +1,44 @@
+# --- nlp_models.py (shared spaCy pipelines: loaded once per process, on first use) ---
+
+import threading
+
+DEFAULT_MODEL = "en_core_web_sm"
+UNUSED_PIPES = ("lemmatizer",)  # no caller in the app needs lemmas, so they are never loaded
+
+# Pipes each kind of caller needs; everything else is skipped for that call
+VECTOR_PIPES = ("tok2vec",)                                           # Doc.similarity (sm vectors come from tok2vec)
+ENTITY_PIPES = ("ner",)                                               # doc.ents (ner has its own tok2vec)
+NOUN_CHUNK_PIPES = ("tok2vec", "tagger", "attribute_ruler", "parser")  # doc.noun_chunks
+
+_MODELS = {}
+_LOCK = threading.Lock()
+
+def get_nlp(name=DEFAULT_MODEL):
+    """The spaCy pipeline `name`, loaded the first time anyone asks for it and shared afterwards."""
+    nlp = _MODELS.get(name)
+    if nlp is None:
+        with _LOCK:
+            nlp = _MODELS.get(name)
+            if nlp is None:
+                import spacy  # importing spaCy alone costs about a second; only pay it when a model is needed
+                nlp = _MODELS[name] = spacy.load(name, exclude=list(UNUSED_PIPES))
+    return nlp
+
+def skipped_pipes(nlp, keep):
+    return [pipe for pipe in nlp.pipe_names if pipe not in keep]
+
+def parse(text, keep=None, name=DEFAULT_MODEL):
+    """Run text through the shared pipeline with only the `keep` pipes enabled (all of them if None)."""
+    nlp = get_nlp(name)
+    if keep is None:
+        return nlp(text)
+    return nlp(text, disable=skipped_pipes(nlp, keep))
+
+def parse_many(texts, keep=None, name=DEFAULT_MODEL, **pipe_kwargs):
+    """
+    Stream texts through nlp.pipe with only the `keep` pipes enabled. pipe_kwargs go to nlp.pipe
+    (batch_size, n_process, as_tuples=True to carry a context object alongside each text).
+    """
+    nlp = get_nlp(name)
+    disable = [] if keep is None else skipped_pipes(nlp, keep)
+    return nlp.pipe(texts, disable=disable, **pipe_kwargs)
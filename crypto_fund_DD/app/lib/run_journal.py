@@ -0,0 +1,102 @@
+# --- run_journal.py (append-only SQLite journal for bulk question-answering runs) ---
+
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+JOURNAL_PATH = "data/runs/answer_runs.sqlite"
+
+class RunJournal:
+    """
+    Records every answered question under (run_id, question_id) as soon as it finishes,
+    so a crashed run can be resumed and partial results can be read while it is running.
+    """
+
+    def __init__(self, path=JOURNAL_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # readers never block the writing run
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                fund_name TEXT,
+                started_at TEXT NOT NULL,
+                finished_at TEXT,
+                meta TEXT
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                run_id TEXT NOT NULL,
+                question_id TEXT NOT NULL,
+                status TEXT,
+                record TEXT NOT NULL,
+                completed_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, question_id)
+            );
+        """)
+        self._conn.commit()
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    # --- Runs ---
+    def start_run(self, fund_name, run_id=None, meta=None):
+        run_id = run_id or f"{fund_name}-{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}"
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO runs (run_id, fund_name, started_at, meta) VALUES (?, ?, ?, ?)",
+                (run_id, fund_name, datetime.utcnow().isoformat(), json.dumps(meta or {}))
+            )
+            self._conn.commit()
+        return run_id
+
+    def finish_run(self, run_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE runs SET finished_at = ? WHERE run_id = ?",
+                (datetime.utcnow().isoformat(), run_id)
+            )
+            self._conn.commit()
+
+    def latest_unfinished_run(self, fund_name):
+        row = self._query(
+            "SELECT run_id FROM runs WHERE fund_name = ? AND finished_at IS NULL "
+            "ORDER BY started_at DESC LIMIT 1",
+            (fund_name,)
+        )
+        return row[0][0] if row else None
+
+    def list_runs(self):
+        rows = self._query("""
+            SELECT r.run_id, r.fund_name, r.started_at, r.finished_at, COUNT(res.question_id)
+            FROM runs r LEFT JOIN results res ON res.run_id = r.run_id
+            GROUP BY r.run_id ORDER BY r.started_at DESC
+        """)
+        return [
+            {"run_id": r[0], "fund_name": r[1], "started_at": r[2], "finished_at": r[3], "answered": r[4]}
+            for r in rows
+        ]
+
+    # --- Results ---
+    def record(self, run_id, question_id, record):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (run_id, question_id, status, record, completed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (run_id, str(question_id), record.get("Status"),
+                 json.dumps(record, ensure_ascii=False), datetime.utcnow().isoformat())
+            )
+            self._conn.commit()
+
+    def completed_ids(self, run_id):
+        rows = self._query("SELECT question_id FROM results WHERE run_id = ?", (run_id,))
+        return {r[0] for r in rows}
+
+    def results(self, run_id):
+        """All records answered so far in this run, keyed by question id (usable mid-run)."""
+        rows = self._query("SELECT question_id, record FROM results WHERE run_id = ?", (run_id,))
+        return {qid: json.loads(record) for qid, record in rows}
@@ -9,12 +9,10 @@ import json
 import streamlit as st
 import base64
 import sys
-from lib.mongo_helpers import db
 from lib.mongo_helpers import append_qa_result
 from lib.mongo_helpers import load_question_bank
 from scripts.visualize_graph import visualize_graph
-from scripts.generate_pptx import main as generate_pptx_main
-from scripts.extraction_and_cleaning import process_uploaded_file
+from scripts.extraction_and_cleaning import process_uploaded_files, register_uploads
 from scripts.semantic_chunker import main as chunking_main
 from scripts.embed_chunks import main as embedding_main
 from scripts.build_graph import main as graph_build_main
@@ -22,9 +20,10 @@ from scripts.graph_rag_retriever import retrieve_context
 from scripts.llm_responder import ask_llm, detect_and_structure_gaps, ask_llm_raw,apply_feedback_to_answer,platform_assistant_safe_answer, followup_assistant,detect_commitments,detect_commitments_in_text,evaluate_answer,check_faithfulness
 from scripts.evaluate_investor_risk import evaluate_investor_risk
 from scripts.risk_scorer import score_investment
-from lib.mongo_helpers import insert_fund_metadata
 from collections import defaultdict
 from lib.mongo_helpers import store_risk_scores
+from lib.graph_store import clear_graph
+from scripts.index_manager import invalidate_index
 
 sys.path.append(os.path.abspath("scripts"))
 
@@ -128,7 +127,7 @@ if uploaded_files:
 
         for file_path in glob.glob('data/new_chunks/*.txt'):
             os.remove(file_path)
-        for path in ["data/embeddings/embeddings.npy", "data/embeddings/ids.txt", "data/faiss_index.index", "data/graph.pkl"]:
+        for path in ["data/embeddings/embeddings.npy", "data/embeddings/ids.txt", "data/faiss_index.index"]:
             if os.path.exists(path):
                 os.remove(path)
         for folder in ["data/chunks/", "data/new_chunks/"]:
@@ -136,33 +135,40 @@ if uploaded_files:
                 shutil.rmtree(folder)
             os.makedirs(folder)
 
-        import scripts.graph_rag_retriever as retriever
-        retriever.index = None
-        retriever.id_list = None
-        retriever.G = None
+        clear_graph()
+        invalidate_index()
 
         st.info("🧹 Cleanup done. Processing new documents only!")
 
         status_text.text("🔄 Extracting and Cleaning Text...")
         for uploaded_file in uploaded_files:
             save_path = os.path.join(UPLOADED_DIR, uploaded_file.name)
-            fund_name = os.path.splitext(uploaded_file.name)[0]           
+            with open(save_path, "wb") as f:
+                f.write(uploaded_file.getbuffer())
+
+        # Byte-identical files (even renamed copies) skip all downstream work; changed files are re-processed
+        uploads = register_uploads(uploaded_files)
+        for upload in uploads:
+            fund_name = upload["fund_name"]
             st.session_state["latest_uploaded_filename"] = fund_name
             os.environ["LATEST_UPLOADED_FUND"] = fund_name
+            if upload["status"] == "new":
+                st.success(f"✅ New fund '{fund_name}' registered.")
+            elif upload["status"] == "changed":
+                st.info(f"🔁 '{upload['file'].name}' changed since the last upload. Re-processing '{fund_name}'.")
+            elif upload["status"] == "unchanged":
+                st.warning(f"⚠️ '{upload['file'].name}' is unchanged. Skipping reprocessing.")
+            else:
+                st.warning(f"⚠️ '{upload['file'].name}' is identical to the already processed fund '{fund_name}'. Skipping reprocessing.")
+        files_to_process = [u["file"] for u in uploads if u["status"] in ("new", "changed")]
+        new_funds = [u["fund_name"] for u in uploads if u["status"] in ("new", "changed")]
 
-            with open(save_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-                # 🔽 INSERT THIS BLOCK HERE (around line 152)
-                existing = db["funds"].find_one({"fund_name": fund_name})
-                if existing:
-                    st.warning(f"⚠️ Fund '{fund_name}' already exists in MongoDB. Skipping reprocessing.")
-                    inserted_id = existing["_id"]
-                else:
-                    inserted_id = insert_fund_metadata(fund_name, uploaded_file.name)
-                    st.success(f"✅ New fund inserted with ID: {inserted_id}")
-                    process_uploaded_file(uploaded_file)
+        # Extract all new files in parallel, one worker process per file
+        def show_extraction_progress(done, total, file_name, error):
+            progress_bar.progress(int(25 * done / total))
+            status_text.text(f"{'❌' if error else '📄'} {file_name} ({done}/{total} extracted)")
 
-            
+        process_uploaded_files(files_to_process, on_progress=show_extraction_progress)
         progress_bar.progress(25)
         st.success("✅ Extraction and Cleaning Done!")
         status_text.text("🔎 Detecting Fund Commitments and Promises...")
@@ -192,12 +198,12 @@ if uploaded_files:
         except Exception as e:
             st.error(f"❌ Failed to detect commitments: {e}")
         status_text.text("🔪 Chunking into Semantic Chunks...")
-        chunking_main()
+        chunking_main(fund_names=new_funds)
         progress_bar.progress(50)
         st.success("✅ Chunking Done!")
 
         status_text.text("🔮 Embedding Chunks...")
-        embedding_main()
+        embedding_main(fund_names=new_funds)
         progress_bar.progress(75)
         st.success("✅ Embedding Done!")
 
@@ -488,6 +494,7 @@ if st.button("📅 Generate Executive PPTX Report"):
     with st.spinner("🧐 Compiling report slides..."):
         try:
             fund_name = st.session_state.get("latest_uploaded_filename")
+            from scripts.generate_pptx import main as generate_pptx_main  # python-pptx loads only when a report is built
             generate_pptx_main()
 
             st.success("✅ Report generated successfully!")
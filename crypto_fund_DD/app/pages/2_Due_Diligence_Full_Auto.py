@@ -5,12 +5,15 @@ import re
 import json
 import streamlit as st
 
-from scripts.extraction_and_cleaning import process_uploaded_file
+from lib.mongo_helpers import append_qa_result
+from lib.graph_store import clear_graph
+from scripts.index_manager import invalidate_index
+from scripts.extraction_and_cleaning import process_uploaded_files, register_uploads
 from scripts.semantic_chunker import main as chunking_main
 from scripts.embed_chunks import main as embedding_main
 from scripts.build_graph import main as graph_build_main
 from scripts.graph_rag_retriever import retrieve_context
-from scripts.llm_responder import ask_llm, evaluate_answer, check_faithfulness, classify_question, detect_and_structure_gaps, ask_llm_raw
+from scripts.llm_responder import ask_llm_stream, evaluate_answer, check_faithfulness, classify_question, detect_and_structure_gaps, ask_llm_raw
 from scripts.intelligent_scraper import intelligent_scrape
 
 # --- JSON Extractor Helper ---
@@ -96,7 +99,7 @@ if uploaded_files:
         # --- Full Cleanup ---
         for file_path in glob.glob('data/new_chunks/*.txt'):
             os.remove(file_path)
-        for path in ["data/embeddings/embeddings.npy", "data/embeddings/ids.txt", "data/faiss_index.index", "data/graph.pkl"]:
+        for path in ["data/embeddings/embeddings.npy", "data/embeddings/ids.txt", "data/faiss_index.index"]:
             if os.path.exists(path):
                 os.remove(path)
         for folder in ["data/chunks/", "data/new_chunks/"]:
@@ -104,10 +107,8 @@ if uploaded_files:
                 shutil.rmtree(folder)
             os.makedirs(folder)
 
-        import scripts.graph_rag_retriever as retriever
-        retriever.index = None
-        retriever.id_list = None
-        retriever.G = None
+        clear_graph()
+        invalidate_index()
 
         st.info("🧹 Cleaned old data. Starting fresh!")
 
@@ -115,22 +116,34 @@ if uploaded_files:
         status_text.text("🔄 Extracting and Cleaning Text...")
         for uploaded_file in uploaded_files:
             save_path = os.path.join(UPLOADED_DIR, uploaded_file.name)
-            filename_clean = os.path.splitext(uploaded_file.name)[0].replace(" ", "").replace("-", "")
-            st.session_state["latest_uploaded_filename"] = filename_clean
-
             with open(save_path, "wb") as f:
                 f.write(uploaded_file.getbuffer())
-            process_uploaded_file(uploaded_file)
+
+        # Byte-identical files (even renamed copies) skip all downstream work; changed files are re-processed
+        uploads = register_uploads(uploaded_files)
+        for upload in uploads:
+            st.session_state["latest_uploaded_filename"] = upload["fund_name"]
+        files_to_process = [u["file"] for u in uploads if u["status"] in ("new", "changed")]
+        uploaded_funds = [u["fund_name"] for u in uploads if u["status"] in ("new", "changed")]
+        if len(files_to_process) < len(uploads):
+            st.info(f"♻️ {len(uploads) - len(files_to_process)} file(s) already processed. Skipping them.")
+
+        # Extract all files in parallel, one worker process per file
+        def show_extraction_progress(done, total, file_name, error):
+            progress_bar.progress(int(25 * done / total))
+            status_text.text(f"{'❌' if error else '📄'} {file_name} ({done}/{total} extracted)")
+
+        process_uploaded_files(files_to_process, on_progress=show_extraction_progress)
         progress_bar.progress(25)
         st.success("✅ Extraction and Cleaning Done!")
 
         status_text.text("🔪 Chunking into Semantic Chunks...")
-        chunking_main()
+        chunking_main(fund_names=uploaded_funds)
         progress_bar.progress(50)
         st.success("✅ Chunking Done!")
 
         status_text.text("🔮 Embedding Chunks...")
-        embedding_main()
+        embedding_main(fund_names=uploaded_funds)
         progress_bar.progress(75)
         st.success("✅ Embedding Done!")
 
@@ -166,55 +179,70 @@ if question:
             with st.expander("📚 Retrieved Context (click to expand)", expanded=False):
                 st.write(context)
 
-            with st.spinner("🧠 Generating professional answer..."):
-                final_answer = ask_llm(question, context)
-
-            st.success("✅ Final Answer Ready!")
             st.markdown("### 💬 Answer:")
-            st.write(final_answer)
-
-            with st.spinner("🛡️ Checking Faithfulness..."):
-                faithfulness = check_faithfulness(question, context, final_answer)
-            st.markdown("### 🛡️ Faithfulness Check:")
-            st.info(faithfulness)
-
-            with st.spinner("📝 Evaluating Answer Quality..."):
-                evaluation_raw = evaluate_answer(question, context, final_answer)
-                try:
-                    evaluation_json = extract_json_from_text(evaluation_raw)
-                    evaluation = json.loads(evaluation_json)
-                except Exception as e:
-                    st.error(f"❌ Failed to parse Evaluation JSON: {e}")
-                    evaluation = {}
-
-            st.markdown("### 📊 Answer Quality Evaluation:")
-            st.json(evaluation)
-
-            gap_analysis = None
-            with st.spinner("🚨 Detecting Missing Information..."):
-                gap_raw = detect_and_structure_gaps(question, context, final_answer, evaluation.get("Missing_Points", []))
-                try:
-                    gap_json = extract_json_from_text(gap_raw)
-                    gap_analysis = json.loads(gap_json)
-                except Exception as e:
-                    st.error(f"❌ Failed to parse Gap Analysis JSON: {e}")
-
-            if gap_analysis:
-                st.markdown("### 🛠️ Gap Analysis for Data Acquisition:")
-                st.json(gap_analysis)
-
-                if st.button("🚀 Fill Missing Gaps"):
-                    with st.spinner("🔎 Scraping external data and improving answer..."):
-                        external_texts = []
-                        for gap in gap_analysis:
-                            query = gap.get("Suggested_Search_Query", "")
-                            if query:
-                                scraped = intelligent_scrape(query, mode="serper", num_results=2)
-                                external_texts.extend(scraped)
-
-                        external_data = "\n\n".join(external_texts)
-
-                        big_prompt = f"""
+            answer_placeholder = st.empty()
+            final_answer = ""
+            stream_status = {}
+            for token in ask_llm_stream(question, context, status=stream_status):
+                final_answer += token
+                answer_placeholder.markdown(final_answer + "▌")
+            final_answer = final_answer.strip()
+            answer_placeholder.write(final_answer)
+
+            if not stream_status.get("complete"):
+                # Failed, cut off or no usable context: nothing is saved, and the next rerun asks the model again
+                st.warning("⚠️ Answer interrupted or not generated, so it was not saved. Ask again to retry.")
+            else:
+                # Persist complete answers only, once per fund and question (Streamlit reruns this block)
+                fund_name = st.session_state.get("latest_uploaded_filename")
+                saved_answers = st.session_state.setdefault("saved_answers", set())
+                if fund_name and (fund_name, question) not in saved_answers:
+                    append_qa_result(fund_name, question, final_answer)
+                    saved_answers.add((fund_name, question))
+                st.success("✅ Final Answer Ready!")
+
+                with st.spinner("🛡️ Checking Faithfulness..."):
+                    faithfulness = check_faithfulness(question, context, final_answer)
+                st.markdown("### 🛡️ Faithfulness Check:")
+                st.info(faithfulness)
+
+                with st.spinner("📝 Evaluating Answer Quality..."):
+                    evaluation_raw = evaluate_answer(question, context, final_answer)
+                    try:
+                        evaluation_json = extract_json_from_text(evaluation_raw)
+                        evaluation = json.loads(evaluation_json)
+                    except Exception as e:
+                        st.error(f"❌ Failed to parse Evaluation JSON: {e}")
+                        evaluation = {}
+
+                st.markdown("### 📊 Answer Quality Evaluation:")
+                st.json(evaluation)
+
+                gap_analysis = None
+                with st.spinner("🚨 Detecting Missing Information..."):
+                    gap_raw = detect_and_structure_gaps(question, context, final_answer, evaluation.get("Missing_Points", []))
+                    try:
+                        gap_json = extract_json_from_text(gap_raw)
+                        gap_analysis = json.loads(gap_json)
+                    except Exception as e:
+                        st.error(f"❌ Failed to parse Gap Analysis JSON: {e}")
+
+                if gap_analysis:
+                    st.markdown("### 🛠️ Gap Analysis for Data Acquisition:")
+                    st.json(gap_analysis)
+
+                    if st.button("🚀 Fill Missing Gaps"):
+                        with st.spinner("🔎 Scraping external data and improving answer..."):
+                            external_texts = []
+                            for gap in gap_analysis:
+                                query = gap.get("Suggested_Search_Query", "")
+                                if query:
+                                    scraped = intelligent_scrape(query, mode="serper", num_results=2)
+                                    external_texts.extend(scraped)
+
+                            external_data = "\n\n".join(external_texts)
+
+                            big_prompt = f"""
 You are a Due Diligence Expert.
 
 Original Context:
@@ -240,12 +268,12 @@ Your task:
 
 New Improved Final Answer:
 """
-                        final_improved_answer = ask_llm_raw(big_prompt)
+                            final_improved_answer = ask_llm_raw(big_prompt)
 
-                        st.success("✅ Final Improved Answer:")
-                        st.markdown(final_improved_answer)
-            else:
-                st.warning("⚠️ No missing information detected.")
+                            st.success("✅ Final Improved Answer:")
+                            st.markdown(final_improved_answer)
+                else:
+                    st.warning("⚠️ No missing information detected.")
 
 st.markdown("---")
 
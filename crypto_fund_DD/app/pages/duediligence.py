@@ -1,7 +1,6 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import base64
-import torch
 import sys
 import os
 import glob
@@ -12,20 +11,20 @@ from collections import defaultdict
 
 # Add the missing import for MongoDB helpers
 sys.path.append(os.path.abspath("lib"))
-from lib.mongo_helpers import db, load_question_bank, insert_fund_metadata, append_qa_result
+from lib.mongo_helpers import load_question_bank, append_qa_result
+from lib.graph_store import clear_graph
+from scripts.index_manager import invalidate_index
 
 sys.path.append(os.path.abspath("scripts"))
-from scripts.llm_responder import ask_llm, platform_assistant_safe_answer, check_faithfulness, evaluate_answer, apply_feedback_to_answer, followup_assistant
+from scripts.llm_responder import ask_llm_stream, platform_assistant_safe_answer, check_faithfulness, evaluate_answer, apply_feedback_to_answer, followup_assistant
 from scripts.graph_rag_retriever import retrieve_context
-from scripts.extraction_and_cleaning import process_uploaded_file
+from scripts.extraction_and_cleaning import process_uploaded_files, register_uploads
 from scripts.semantic_chunker import main as chunking_main
 from scripts.embed_chunks import main as embedding_main
 from scripts.build_graph import main as graph_build_main
 from scripts.validate_commitments import validate_all_commitments
 from scripts.validate_commitments_step2 import validate_step2
-from scripts.generate_pptx import main as generate_pptx_main
 
-_ = torch.classes  # Fix for PyTorch + Streamlit runtime issue
 
 def highlight_matches(text, search_term):
     if not search_term.strip():
@@ -706,7 +705,7 @@ if uploaded_files:
         # Clean up previous data
         for file_path in glob.glob('data/new_chunks/*.txt'):
             os.remove(file_path)
-        for path in ["data/embeddings/embeddings.npy", "data/embeddings/ids.txt", "data/faiss_index.index", "data/graph.pkl"]:
+        for path in ["data/embeddings/embeddings.npy", "data/embeddings/ids.txt", "data/faiss_index.index"]:
             if os.path.exists(path):
                 os.remove(path)
         for folder in ["data/chunks/", "data/new_chunks/"]:
@@ -714,39 +713,44 @@ if uploaded_files:
                 shutil.rmtree(folder)
             os.makedirs(folder)
 
-        import scripts.graph_rag_retriever as retriever
-        retriever.index = None
-        retriever.id_list = None
-        retriever.G = None
+        clear_graph()
+        invalidate_index()
 
         #st.info("🧹 Cleanup done. Processing new documents only!")
 
         status_text.text("🔄 Extracting and Cleaning Text...")
         for uploaded_file in uploaded_files:
             save_path = os.path.join(UPLOADED_DIR, uploaded_file.name)
-            fund_name = os.path.splitext(uploaded_file.name)[0]
-            st.session_state["latest_uploaded_filename"] = fund_name
-            os.environ["LATEST_UPLOADED_FUND"] = fund_name
-
             with open(save_path, "wb") as f:
                 f.write(uploaded_file.getbuffer())
-                existing = db["funds"].find_one({"fund_name": fund_name})
-                if existing:
-                    #st.warning(f"⚠️ Fund '{fund_name}' already exists in MongoDB. Skipping reprocessing.")
-                    inserted_id = existing["_id"]
-                else:
-                    inserted_id = insert_fund_metadata(fund_name, uploaded_file.name)
-                    #st.success(f"✅ New fund inserted with ID: {inserted_id}")
-                    process_uploaded_file(uploaded_file)
+
+        # Byte-identical files (even renamed copies) skip all downstream work; changed files are re-processed
+        uploads = register_uploads(uploaded_files)
+        for upload in uploads:
+            st.session_state["latest_uploaded_filename"] = upload["fund_name"]
+            os.environ["LATEST_UPLOADED_FUND"] = upload["fund_name"]
+        files_to_process = [u["file"] for u in uploads if u["status"] in ("new", "changed")]
+        new_funds = [u["fund_name"] for u in uploads if u["status"] in ("new", "changed")]
+
+        # Extract all new files in parallel, one worker process per file
+        def show_extraction_progress(done, total, file_name, error):
+            progress_bar.progress(int(25 * done / total))
+            status_text.text(f"{'❌' if error else '📄'} {file_name} ({done}/{total} extracted)")
+
+        process_uploaded_files(files_to_process, on_progress=show_extraction_progress)
 
        # progress_bar.progress(25)
         #st.success("✅ File Uploaded!")
 
-       # chunking_main()
-      #  progress_bar.progress(50)
+        # Only the newly uploaded funds are chunked, embedded and added to the index
+        if new_funds:
+            status_text.text("🔪 Chunking new documents...")
+            chunking_main(fund_names=new_funds)
+            progress_bar.progress(50)
 
-        #embedding_main()
-        #progress_bar.progress(75)
+            status_text.text("🔮 Embedding new documents...")
+            embedding_main(fund_names=new_funds)
+            progress_bar.progress(75)
 
         #graph_build_main()
        # progress_bar.progress(100)
@@ -935,19 +939,34 @@ if st.session_state.get("selected_category"):
         q_id = selected_q["id"]
 
         # Generate or retrieve answer if not already in session state
+        incomplete_answer = None
         if f"answer_{q_id}" not in st.session_state:
-            with st.spinner("🔍 Retrieving and generating answer..."):
+            with st.spinner("🔍 Retrieving relevant context..."):
                 context = retrieve_context(q_text, source_filter=st.session_state.get("latest_uploaded_filename"))
-                if context and not context.startswith("❌"):
-                    answer = ask_llm(q_text, context)
-                    fund_name = st.session_state.get("latest_uploaded_filename")
+            if context and not context.startswith("❌"):
+                # Stream tokens into a placeholder, then persist the finished answer
+                stream_placeholder = st.empty()
+                answer = ""
+                stream_status = {}
+                for token in ask_llm_stream(q_text, context, status=stream_status):
+                    answer += token
+                    stream_placeholder.markdown(answer + "▌")
+                stream_placeholder.empty()
+                answer = answer.strip()
+                fund_name = st.session_state.get("latest_uploaded_filename")
+                if stream_status.get("complete"):
                     append_qa_result(fund_name, q_text, answer)
                     st.session_state[f"answer_{q_id}"] = answer
                     st.session_state[f"context_{q_id}"] = context
                 else:
-                    st.session_state[f"answer_{q_id}"] = "⚠️ No relevant information found."
+                    # Kept out of session state, so the next rerun asks the model again
+                    incomplete_answer = answer
+                    st.warning("⚠️ Answer interrupted or not generated, so it was not saved. Click Retry to ask again.")
+                    st.button("🔁 Retry", key=f"retry_{q_id}")
+            else:
+                st.session_state[f"answer_{q_id}"] = "⚠️ No relevant information found."
 
-        answer = st.session_state.get(f"answer_{q_id}", "⚠️ No answer available.")
+        answer = st.session_state.get(f"answer_{q_id}", incomplete_answer or "⚠️ No answer available.")
         st.markdown(f"""
         <div class="chat-message-user">
             <strong>Q:</strong> {q_text}
@@ -1026,6 +1045,7 @@ if not st.session_state.get("pptx_generated", False):
         with st.spinner("🧐 Compiling report slides..."):
             try:
                 fund_name = st.session_state.get("latest_uploaded_filename")
+                from scripts.generate_pptx import main as generate_pptx_main  # python-pptx loads only when a report is built
                 generate_pptx_main()
                 st.session_state["pptx_generated"] = True
                 st.success("✅ Report generated successfully!")
@@ -1,12 +1,10 @@
 import streamlit.components.v1 as components
 import base64
-import torch
 import sys
 import os
 sys.path.append(os.path.abspath("scripts"))
 from scripts.llm_responder import platform_assistant_safe_answer
 
-_ = torch.classes  # Fix for PyTorch + Streamlit runtime issue
 import streamlit as st
 
 st.set_page_config(
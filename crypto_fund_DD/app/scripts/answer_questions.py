@@ -1,11 +1,16 @@
 import os
 import json
+import time
+import argparse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 from tqdm import tqdm
 
 from scripts.graph_rag_retriever import retrieve_context
-from scripts.llm_responder import ask_llm, detect_and_structure_gaps
-from lib.mongo_helpers import append_qa_result
+from scripts.llm_responder import ask_llm, detect_and_structure_gaps, llm_cache_stats, FAILED_RESPONSE
+from lib.mongo_helpers import upsert_qa_result
+from lib.run_journal import RunJournal
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -14,65 +19,148 @@ QUESTION_BANK_PATH = "data/question_bank.json"
 OUTPUT_PATH = "data/auto_answered_questions.csv"
 GAPS_OUTPUT_PATH = "data/missing_gaps_to_scrape.json"
 
-# --- Load Question Bank ---
-print("🔄 Loading question bank...")
-with open(QUESTION_BANK_PATH, "r", encoding="utf-8") as f:
-    questions = json.load(f)
+# --- Concurrency ---
+# Questions in flight at once; keep it at or below the Ollama server's OLLAMA_NUM_PARALLEL.
+MAX_IN_FLIGHT = int(os.environ.get("ANSWER_MAX_IN_FLIGHT", "4"))
 
-print(f"✅ Loaded {len(questions)} questions.")
+# --- Journal key: the question id, else its text (questions without an id must not share one key) ---
+def question_key(q):
+    q_id = q.get("id")
+    return str(q_id) if q_id not in (None, "") else f"text:{q.get('question', '').strip()}"
 
-# --- Answer all questions ---
-all_results = []
-all_gaps = {}
-
-for q in tqdm(questions, desc="🧠 Answering Questions"):
+# --- One question: retrieve -> answer -> persist -> gaps ---
+# Embedding or LLM failures raise, so the question is not journaled and a rerun retries it.
+def answer_question(q, fund_name):
     q_id = q.get("id", "")
     q_text = q.get("question", "")
-
-    if not q_text.strip():
-        continue
+    timings = {}
 
     # Step 1: Retrieve context
-    context = retrieve_context(q_text)
+    start = time.perf_counter()
+    context = retrieve_context(q_text, raise_errors=True)
+    timings["retrieve"] = time.perf_counter() - start
 
     # Step 2: If context found, ask LLM
     if context and context.strip() and "❌" not in context:
+        start = time.perf_counter()
         answer = ask_llm(q_text, context)
+        timings["llm"] = time.perf_counter() - start
+        if answer == FAILED_RESPONSE:
+            raise RuntimeError(FAILED_RESPONSE)
         status = "Found"
-        # Use latest_uploaded_filename as fund name
-        fund_name = os.environ.get("LATEST_UPLOADED_FUND") or "default_fund"
-        append_qa_result(fund_name, q_text, answer)
+
+        # Keyed by question, so a question re-answered after a crash is not stored twice
+        start = time.perf_counter()
+        upsert_qa_result(fund_name, q_text, answer)
+        timings["store"] = time.perf_counter() - start
 
         # Step 3: Detect and structure gaps
+        start = time.perf_counter()
         gap_raw = detect_and_structure_gaps(q_text, context, answer)
+        timings["gaps"] = time.perf_counter() - start
         try:
             gap_json = json.loads(gap_raw) if isinstance(gap_raw, str) else {}
         except Exception:
             gap_json = {"Status": "❌ Failed to parse gap JSON."}
-
-        all_gaps[q_id] = gap_json
     else:
         answer = "No answer found based on the provided documents."
         status = "Not Found"
-        all_gaps[q_id] = {"Status": "❌ No context to analyze gaps."}
+        gap_json = {"Status": "❌ No context to analyze gaps."}
 
-    all_results.append({
+    return {
         "ID": q_id,
         "Question": q_text,
         "Answer": answer,
-        "Status": status
-    })
-
-# --- Save Results to CSV ---
-df = pd.DataFrame(all_results)
-os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
-df.to_csv(OUTPUT_PATH, index=False)
-
-# --- Save Missing Gaps for Scraping ---
-os.makedirs(os.path.dirname(GAPS_OUTPUT_PATH), exist_ok=True)
-with open(GAPS_OUTPUT_PATH, "w", encoding="utf-8") as f:
-    json.dump(all_gaps, f, indent=2, ensure_ascii=False)
-
-print(f"✅ All answers saved to {OUTPUT_PATH}")
-print(f"✅ Missing gaps saved to {GAPS_OUTPUT_PATH}")
-print("🏁 Auto-answering complete!")
+        "Status": status,
+        "Gaps": gap_json,
+        "Timings": timings
+    }
+
+def print_timing_summary(records, wall_time):
+    totals = defaultdict(float)
+    counts = defaultdict(int)
+    for record in records:
+        for stage, seconds in record.get("Timings", {}).items():
+            totals[stage] += seconds
+            counts[stage] += 1
+    print(f"⏱️ Wall time: {wall_time:.1f}s for {len(records)} questions")
+    for stage in totals:
+        print(f"   {stage:<8} total {totals[stage]:8.1f}s | mean {totals[stage] / counts[stage]:6.2f}s")
+
+# --- Batch runner ---
+def main(max_in_flight=MAX_IN_FLIGHT, run_id=None, resume=True):
+    """
+    Answer the question bank under a journaled run. Every finished question is written
+    to the run journal immediately; rerunning resumes the fund's latest unfinished run
+    (or the given run_id) and skips what it already answered.
+    """
+    print("🔄 Loading question bank...")
+    with open(QUESTION_BANK_PATH, "r", encoding="utf-8") as f:
+        questions = json.load(f)
+    questions = [q for q in questions if q.get("question", "").strip()]
+    print(f"✅ Loaded {len(questions)} questions.")
+
+    # Use latest_uploaded_filename as fund name
+    fund_name = os.environ.get("LATEST_UPLOADED_FUND") or "default_fund"
+
+    journal = RunJournal()
+    if run_id is None and resume:
+        run_id = journal.latest_unfinished_run(fund_name)
+    run_id = journal.start_run(fund_name, run_id=run_id, meta={"question_bank": QUESTION_BANK_PATH})
+    done = journal.completed_ids(run_id)
+    pending = [q for q in questions if question_key(q) not in done]
+    print(f"📒 Run {run_id}: {len(done)} already answered, {len(pending)} to go.")
+
+    start = time.perf_counter()
+    new_records = []
+    with ThreadPoolExecutor(max_workers=max(1, max_in_flight)) as pool:
+        futures = {pool.submit(answer_question, q, fund_name): q for q in pending}
+        for future in tqdm(as_completed(futures), total=len(futures), desc="🧠 Answering Questions"):
+            q = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                print(f"❌ Question {q.get('id', '')} failed: {e}")
+                continue  # not journaled, so a rerun retries it
+            journal.record(run_id, question_key(q), record)
+            new_records.append(record)
+    print_timing_summary(new_records, time.perf_counter() - start)
+    cache = llm_cache_stats()
+    print(f"🗃️ LLM cache: {cache['hits']} hits / {cache['misses']} misses (hit rate {cache['hit_rate']:.0%})")
+
+    # --- Collect results in question-bank order ---
+    answered = journal.results(run_id)
+    keys = [question_key(q) for q in questions if question_key(q) in answered]
+    ordered = [answered[key] for key in keys]
+    all_results = [{k: r[k] for k in ("ID", "Question", "Answer", "Status")} for r in ordered]
+    all_gaps = {key: r["Gaps"] for key, r in zip(keys, ordered)}
+    if len(ordered) == len(questions):
+        journal.finish_run(run_id)
+
+    # --- Save Results to CSV ---
+    df = pd.DataFrame(all_results)
+    os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
+    df.to_csv(OUTPUT_PATH, index=False)
+
+    # --- Save Missing Gaps for Scraping ---
+    os.makedirs(os.path.dirname(GAPS_OUTPUT_PATH), exist_ok=True)
+    with open(GAPS_OUTPUT_PATH, "w", encoding="utf-8") as f:
+        json.dump(all_gaps, f, indent=2, ensure_ascii=False)
+
+    print(f"✅ All answers saved to {OUTPUT_PATH}")
+    print(f"✅ Missing gaps saved to {GAPS_OUTPUT_PATH}")
+    print("🏁 Auto-answering complete!")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer the whole question bank against the uploaded fund documents.")
+    parser.add_argument("--workers", type=int, default=MAX_IN_FLIGHT, help="questions in flight at once")
+    parser.add_argument("--run-id", default=None, help="resume (or create) this run instead of the latest unfinished one")
+    parser.add_argument("--fresh", action="store_true", help="start a new run instead of resuming")
+    parser.add_argument("--list-runs", action="store_true", help="show journaled runs and their progress, then exit")
+    args = parser.parse_args()
+    if args.list_runs:
+        for run in RunJournal().list_runs():
+            state = "finished" if run["finished_at"] else "in progress"
+            print(f"{run['run_id']}: {run['answered']} answered ({state}, started {run['started_at']})")
+    else:
+        main(max_in_flight=args.workers, run_id=args.run_id, resume=not args.fresh)
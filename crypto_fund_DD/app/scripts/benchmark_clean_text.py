@@ -0,0 +1,81 @@
+# --- benchmark_clean_text.py (equivalence + speed check: streaming text_cleaner vs the original clean_text) ---
+#
+# Usage (from crypto_fund_DD/app):  python -m scripts.benchmark_clean_text [--repeat 5] [--scale 1]
+
+import os
+import re
+import glob
+import time
+import argparse
+import unicodedata
+from scripts.text_cleaner import clean_text
+
+EXTRACTED_DIR = "data/extracted_data/"
+
+# --- Reference: the original multi-pass implementation, kept verbatim ---
+def legacy_clean_text(raw_text: str) -> str:
+    text = unicodedata.normalize("NFKD", raw_text)
+    text = re.sub(r"(page\s*\d+(\s*of\s*\d+)?)", "", text, flags=re.IGNORECASE)
+    text = re.sub(r"(confidential|proprietary|internal use only)", "", text, flags=re.IGNORECASE)
+    text = re.sub(r'(?m)^[^\n]{1,20}\n', '', text)
+    text = re.sub(r'(?m)^\s*(\d{1,2}([-/]\d{1,2}){1,2})\s*$', '', text)
+    text = re.sub(r'[_*\-=~•■◆►¤✦●⚫️★☆]+', ' ', text)
+    text = re.sub(r'^[\s]*[\-\*•➤►▪️•⚫️●>]+[\s]+', '- ', text, flags=re.MULTILINE)
+    text = re.sub(r'^(\d+)\.\s*', r'\1. ', text, flags=re.MULTILINE)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    lines = text.splitlines()
+    new_lines = []
+    previous_line = None
+    for line in lines:
+        if line != previous_line:
+            new_lines.append(line)
+        previous_line = line
+    text = "\n".join(new_lines)
+    text = re.sub(r'(\d+)\.([A-Z])', r'\1. \2', text)
+    text = re.sub(r'(?m)^[ \t]+', '', text)
+    text = re.sub(r'(?m)[ \t]+$', '', text)
+    text = re.sub(r'[ \t]{2,}', ' ', text)
+    text = text.strip()
+    return text
+
+def best_time(func, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(repeat=5, scale=1):
+    paths = sorted(glob.glob(os.path.join(EXTRACTED_DIR, "*.txt")))
+    if not paths:
+        print(f"⚠️ No .txt files found in {EXTRACTED_DIR}")
+        return
+
+    mismatches = []
+    legacy_total = fused_total = 0.0
+    total_chars = 0
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read() * scale
+        if clean_text(text) != legacy_clean_text(text):
+            mismatches.append(os.path.basename(path))
+            continue
+        legacy_total += best_time(legacy_clean_text, text, repeat)
+        fused_total += best_time(clean_text, text, repeat)
+        total_chars += len(text)
+
+    print(f"📄 {len(paths)} files, {total_chars / 1e6:.2f}M characters (scale x{scale})")
+    if mismatches:
+        print(f"❌ Output differs for {len(mismatches)} file(s): {', '.join(mismatches)}")
+    else:
+        print("✅ Output identical to the original clean_text for every file.")
+    print(f"⏱️ original: {legacy_total * 1000:8.1f} ms")
+    print(f"⏱️ streaming: {fused_total * 1000:7.1f} ms  ({legacy_total / fused_total:.2f}x)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the streaming text cleaner against the original clean_text.")
+    parser.add_argument("--repeat", type=int, default=5, help="timing runs per file (best is kept)")
+    parser.add_argument("--scale", type=int, default=1, help="repeat each file's text N times to simulate larger documents")
+    args = parser.parse_args()
+    main(repeat=args.repeat, scale=args.scale)
@@ -0,0 +1,79 @@
+# --- benchmark_import_time.py (cold-start import profile of every Streamlit page) ---
+#
+# Runs each page's top-level import statements (not the page itself) in a fresh interpreter
+# under `python -X importtime` and reports the total and the slowest top-level modules.
+# Usage (from crypto_fund_DD/app):  python -m scripts.benchmark_import_time [--top 8] [--budget-ms 3000]
+
+import os
+import sys
+import ast
+import glob
+import argparse
+import subprocess
+from collections import defaultdict
+
+PAGES_DIR = "pages/"
+
+def page_imports(path):
+    """Source of the module-level import statements of a page, in order."""
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+def parse_importtime(stderr):
+    """
+    Map each module imported directly by the profiled code (indent level 0 in the report)
+    to its cumulative import time in microseconds.
+    """
+    cumulative = defaultdict(int)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum_us, name = line[len("import time:"):].split("|")
+        if not cum_us.strip().isdigit():  # header row
+            continue
+        if name.startswith(" ") and not name.startswith("  "):  # one space of padding = top level
+            cumulative[name.strip()] += int(cum_us)
+    return cumulative
+
+def run_importtime(code):
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True)
+    error = None
+    if proc.returncode != 0:
+        error = (proc.stderr.strip().splitlines() or ["unknown error"])[-1]
+    return parse_importtime(proc.stderr), error
+
+def profile_page(path, startup_modules=()):
+    """Top-level modules a page imports and their cumulative cost, minus what the interpreter loads anyway."""
+    code = "\n".join(["import sys, os", "sys.path.append(os.path.abspath('lib'))",
+                      "sys.path.append(os.path.abspath('scripts'))"] + page_imports(path))
+    modules, error = run_importtime(code)
+    return {name: us for name, us in modules.items() if name not in startup_modules}, error
+
+def main(top=8, budget_ms=None):
+    paths = sorted(glob.glob(os.path.join(PAGES_DIR, "*.py")))
+    startup_modules, _ = run_importtime("import sys, os")
+    over_budget = []
+    for path in paths:
+        modules, error = profile_page(path, startup_modules)
+        total_ms = sum(modules.values()) / 1000
+        print(f"\n📄 {os.path.basename(path)}: {total_ms:8.1f} ms")
+        if error:
+            print(f"   ❌ imports failed: {error}")
+        for name, cum_us in sorted(modules.items(), key=lambda item: -item[1])[:top]:
+            print(f"   {cum_us / 1000:8.1f} ms  {name}")
+        if budget_ms is not None and (error or total_ms > budget_ms):  # a failed import proves nothing
+            over_budget.append(os.path.basename(path))
+
+    if budget_ms is not None:
+        if over_budget:
+            print(f"\n❌ Over the {budget_ms:.0f} ms import budget: {', '.join(over_budget)}")
+            sys.exit(1)
+        print(f"\n✅ Every page imports within {budget_ms:.0f} ms.")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Profile the import-time cost of each Streamlit page.")
+    parser.add_argument("--top", type=int, default=8, help="slowest top-level modules to list per page")
+    parser.add_argument("--budget-ms", type=float, default=None, help="exit non-zero if a page takes longer than this")
+    args = parser.parse_args()
+    main(top=args.top, budget_ms=args.budget_ms)
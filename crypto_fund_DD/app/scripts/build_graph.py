@@ -1,86 +1,161 @@
 import os
-import glob
-import networkx as nx
-import spacy
-import pickle
+import time
+import numpy as np
 from tqdm import tqdm
+from lib.nlp_models import parse, parse_many, ENTITY_PIPES, NOUN_CHUNK_PIPES
+from lib.mongo_helpers import get_fund_names_with_chunks, get_chunk_texts, chunk_id
+from lib.graph_store import GRAPH_DIR, load_graph, save_graph
 
 # --- Settings ---
-CHUNK_DIR = "data/chunks/"
-GRAPH_PATH = "data/graph.pkl"
+CONCEPT_PIPES = ENTITY_PIPES + NOUN_CHUNK_PIPES
 
-# Load Spacy NLP model
-nlp = spacy.load("en_core_web_sm")
+# --- spaCy batching ---
+NLP_BATCH_SIZE = 64                                                   # chunks per nlp.pipe batch
+NLP_PROCESSES = int(os.environ.get("GRAPH_NLP_PROCESSES", os.cpu_count() or 1))
+CHUNKS_PER_PROCESS = 200                                              # fewer chunks than this don't pay for a worker's start-up
 
-def extract_key_concepts(text):
-    """Extract entities and noun chunks from text."""
-    doc = nlp(text)
+# --- Edges ---
+GRAPH_TOP_K = 10                # strongest neighbours kept per chunk
+MAX_CONCEPT_CHUNKS = 1000       # concepts in more chunks than this ("the fund") link nothing; keeps edge building near-linear
+SIMILARITY_BLOCK_ROWS = 1024    # chunk rows multiplied at a time
+
+def concepts_from_doc(doc):
+    """Entities and noun chunks of a parsed chunk."""
     entities = [ent.text.strip().lower() for ent in doc.ents if len(ent.text) > 2]
     noun_chunks = [chunk.text.strip().lower() for chunk in doc.noun_chunks if len(chunk.text) > 2]
     return list(set(entities + noun_chunks))
 
+def extract_key_concepts(text):
+    """Extract entities and noun chunks from text."""
+    return concepts_from_doc(parse(text, keep=CONCEPT_PIPES))
+
+def read_chunks(fund_names=None):
+    """{chunk_id: text} for every chunk in MongoDB, keyed like the FAISS index so retrieval can walk the graph."""
+    chunks = {}
+    for fund_name in get_fund_names_with_chunks(fund_names):
+        for i, text in enumerate(get_chunk_texts(fund_name)):
+            chunks[chunk_id(fund_name, i)] = text
+    return chunks
+
+def iter_chunk_concepts(chunks, batch_size=NLP_BATCH_SIZE, n_process=None):
+    """
+    Yield (chunk_id, text, concepts) for a list of (text, chunk_id) pairs, parsing the chunks
+    in batches (and worker processes for large runs).
+    """
+    if n_process is None:
+        n_process = max(1, min(NLP_PROCESSES, len(chunks) // CHUNKS_PER_PROCESS))
+    docs = parse_many(chunks, keep=CONCEPT_PIPES, as_tuples=True,
+                      batch_size=batch_size, n_process=n_process)
+    for doc, chunk_id in docs:
+        yield chunk_id, doc.text, concepts_from_doc(doc)
+
+def build_incidence(chunk_concepts):
+    """
+    Binary chunk x concept incidence matrix (CSR) of a list of concept lists,
+    and the concept vocabulary in column order.
+    """
+    from scipy import sparse
+
+    vocabulary = {}
+    indices, indptr = [], [0]
+    for concepts in chunk_concepts:
+        indices.extend(vocabulary.setdefault(concept, len(vocabulary)) for concept in set(concepts))
+        indptr.append(len(indices))
+    incidence = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr),
+                                  shape=(len(chunk_concepts), len(vocabulary)))
+    incidence.sort_indices()
+    return incidence, list(vocabulary)
+
+def idf_weights(incidence):
+    """log(N / df) per concept; 0 for concepts in a single chunk (nothing to link) or in more than MAX_CONCEPT_CHUNKS."""
+    n_chunks = incidence.shape[0]
+    df = np.bincount(incidence.indices, minlength=incidence.shape[1])
+    idf = np.log(n_chunks / np.maximum(df, 1)).astype(np.float32)
+    idf[(df < 2) | (df > MAX_CONCEPT_CHUNKS)] = 0
+    return idf
+
+def top_k_edges(incidence, k=GRAPH_TOP_K, block_rows=SIMILARITY_BLOCK_ROWS):
+    """
+    Chunk-chunk edges as an upper-triangular sparse matrix of cosine similarities between
+    IDF-weighted concept vectors. Each chunk keeps its k strongest neighbours; a pair is an
+    edge if either end kept the other. Similarities come from sparse products, one block of rows at a time.
+    """
+    from scipy import sparse
+
+    n_chunks = incidence.shape[0]
+    weighted = sparse.csr_matrix(incidence.multiply(idf_weights(incidence)[None, :]))
+    weighted.eliminate_zeros()
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    weighted = sparse.diags(np.divide(1, norms, out=np.zeros_like(norms), where=norms > 0)) @ weighted
+    transposed = weighted.T.tocsr()
+
+    rows, cols, sims = [], [], []
+    for start in range(0, n_chunks, block_rows):
+        block = (weighted[start:start + block_rows] @ transposed).tocsr()
+        for i in range(block.shape[0]):
+            lo, hi = block.indptr[i], block.indptr[i + 1]
+            neighbours, values = block.indices[lo:hi], block.data[lo:hi]
+            keep = neighbours != start + i
+            neighbours, values = neighbours[keep], values[keep]
+            if len(values) > k:
+                strongest = np.argpartition(-values, k - 1)[:k]
+                neighbours, values = neighbours[strongest], values[strongest]
+            rows.append(np.full(len(neighbours), start + i))
+            cols.append(neighbours)
+            sims.append(values)
+
+    if not rows:
+        return sparse.coo_matrix((n_chunks, n_chunks), dtype=np.float32)
+    kept = sparse.csr_matrix((np.concatenate(sims), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(n_chunks, n_chunks))
+    return sparse.triu(kept.maximum(kept.T), k=1).tocoo()
+
 def main():
     # --- Load Existing Graph if Available ---
-    if os.path.exists(GRAPH_PATH):
-        print("🔄 Loading existing graph...")
-        with open(GRAPH_PATH, "rb") as f:
-            G = pickle.load(f)
+    store = load_graph(GRAPH_DIR)
+    if store is not None:
+        print(f"🔄 Loaded existing graph ({store.n_nodes} chunks).")
     else:
         print("🆕 No previous graph found. Starting fresh.")
-        G = nx.Graph()
-
-    # --- Load Chunks from CHUNK_DIR directly ---
-    chunk_files = sorted(glob.glob(os.path.join(CHUNK_DIR, "*.txt")))
-
-    if not chunk_files:
-        print("🚫 No chunks found. Saving empty graph.")
-        os.makedirs(os.path.dirname(GRAPH_PATH), exist_ok=True)
-        with open(GRAPH_PATH, "wb") as f:
-            pickle.dump(G, f)
-        return
-
-    print(f"🔎 Found {len(chunk_files)} chunks to add to the graph.")
-
-    existing_nodes = set(G.nodes())
-    concept_index = {}
 
-    # --- Add Only New Nodes ---
-    for file in tqdm(chunk_files, desc="🔎 Processing chunks"):
-        chunk_id = os.path.basename(file)
-
-        if chunk_id in existing_nodes:
-            continue  # Skip already existing nodes
-
-        with open(file, "r", encoding="utf-8") as f:
-            text = f.read()
-
-        concepts = extract_key_concepts(text)
-
-        if not concepts:
-            continue
-
-        G.add_node(chunk_id, text=text, concepts=concepts)
-
-        for concept in concepts:
-            if concept not in concept_index:
-                concept_index[concept] = []
-            concept_index[concept].append(chunk_id)
-
-    # --- Add Only New Edges ---
-    for concept, related_chunks in tqdm(concept_index.items(), desc="🔗 Building new edges"):
-        for i in range(len(related_chunks)):
-            for j in range(i + 1, len(related_chunks)):
-                if not G.has_edge(related_chunks[i], related_chunks[j]):
-                    G.add_edge(related_chunks[i], related_chunks[j])
-
-    print(f"✅ Graph now has {G.number_of_nodes()} nodes and {G.number_of_edges()} edges.")
+    # --- Load Chunks from MongoDB ---
+    chunks = read_chunks()
+    print(f"🔎 Found {len(chunks)} chunks in MongoDB.")
+
+    # --- Keep Concepts of Unchanged Chunks, (Re)parse the Rest ---
+    chunk_concepts = {}
+    new_chunks = []
+    for cid, text in chunks.items():
+        i = store.index_of(cid) if store is not None else -1
+        if i >= 0 and store.text(i) == text:
+            chunk_concepts[cid] = store.concepts(i)
+        else:
+            new_chunks.append((text, cid))
+    if store is not None and store.n_nodes > len(chunk_concepts):
+        print(f"🧹 Dropping {store.n_nodes - len(chunk_concepts)} chunks that were removed or re-chunked.")
+
+    start = time.perf_counter()
+    for cid, text, concepts in tqdm(iter_chunk_concepts(new_chunks), total=len(new_chunks), desc="🔎 Processing chunks"):
+        if concepts:
+            chunk_concepts[cid] = concepts
+
+    elapsed = time.perf_counter() - start
+    if new_chunks:
+        print(f"⚡ Parsed {len(new_chunks)} new chunks in {elapsed:.1f}s ({len(new_chunks) / max(elapsed, 1e-9):.1f} chunks/s)")
+
+    # --- Concept Incidence and Edges (whole corpus: IDF changes as chunks are added) ---
+    start = time.perf_counter()
+    chunk_ids = sorted(chunk_concepts)
+    incidence, concepts = build_incidence([chunk_concepts[cid] for cid in chunk_ids])
+    edges = top_k_edges(incidence)
+    adjacency = (edges + edges.T).tocsr()
+    print(f"🔗 {incidence.nnz} chunk-concept links over {len(concepts)} concepts -> "
+          f"{edges.nnz} edges in {time.perf_counter() - start:.1f}s")
 
     # --- Save Updated Graph ---
-    os.makedirs(os.path.dirname(GRAPH_PATH), exist_ok=True)
-    with open(GRAPH_PATH, "wb") as f:
-        pickle.dump(G, f)
-
-    print(f"✅ Graph updated and saved to {GRAPH_PATH}")
+    save_graph(chunk_ids, [chunks[cid] for cid in chunk_ids], incidence, concepts, adjacency, GRAPH_DIR)
+    print(f"✅ Graph now has {len(chunk_ids)} nodes and {edges.nnz} edges.")
+    print(f"✅ Graph updated and saved to {GRAPH_DIR}")
     print("🏁 Graph update complete!")
 
 # --- Main Entry ---
@@ -4,13 +4,12 @@ import os
 import json
 import numpy as np
 from tqdm import tqdm
-import ollama
 from sklearn.metrics.pairwise import cosine_similarity
+from lib.embedding_client import embed_texts
 
 # --- Configuration ---
 INPUT_PATH = "data/question_bank.json"
 OUTPUT_PATH = "data/classified_questions.json"
-EMBED_MODEL = "nomic-embed-text"
 
 # --- Final Professional Tags ---
 TAGS = [
@@ -29,31 +28,25 @@ TAGS = [
     "Community & UX"
 ]
 
-# --- Get Embedding ---
-def get_embedding(text):
-    response = ollama.embeddings(model=EMBED_MODEL, prompt=text)
-    return np.array(response['embedding'], dtype='float32')
-
 # --- Embed Tags Once ---
-tag_embeddings = [get_embedding(tag) for tag in TAGS]
+tag_embeddings = embed_texts(TAGS)
 
 # --- Load Questions ---
 with open(INPUT_PATH, "r", encoding="utf-8") as f:
     questions = json.load(f)
 
+questions = [q for q in questions if q.get("question", "").strip()]
+
+# --- Embed All Questions in Batches ---
+question_embeddings = embed_texts([q["question"] for q in questions])
+best_tag_idxs = np.argmax(cosine_similarity(question_embeddings, tag_embeddings), axis=1)
+
 classified = []
 
 # --- Classify Each Question ---
-for q in tqdm(questions, desc="🔍 Classifying questions"):
+for q, best_tag_idx in tqdm(zip(questions, best_tag_idxs), total=len(questions), desc="🔍 Classifying questions"):
     question_id = q.get("id")
     question_text = q.get("question")
-    
-    if not question_text.strip():
-        continue
-
-    q_emb = get_embedding(question_text).reshape(1, -1)
-    similarities = cosine_similarity(q_emb, tag_embeddings)[0]
-    best_tag_idx = np.argmax(similarities)
     best_tag = TAGS[best_tag_idx]
 
     classified.append({
@@ -1,33 +1,27 @@
-# --- embed_chunks.py (store list of embeddings per fund) ---
+# --- embed_chunks.py (store packed float32 embeddings on each chunk document) ---
 import numpy as np
-import ollama
 from tqdm import tqdm
-from lib.mongo_helpers import get_all_funds_with_chunks, update_fund_field
-OLLAMA_MODEL = "nomic-embed-text"
+from lib.mongo_helpers import get_fund_names_with_chunks, get_chunk_texts, store_fund_embeddings
+from lib.embedding_client import embed_texts
+from scripts.index_manager import upsert_fund
 
-def generate_embedding(text):
-    response = ollama.embeddings(
-        model=OLLAMA_MODEL,
-        prompt=text
-    )
-    return response["embedding"]
+def embed_fund(fund_name, chunks):
+    """Embed one fund's chunks, store them, and add/replace only that fund's vectors in the index."""
+    all_embeddings = embed_texts(chunks)
 
-def main():
-    print("🔄 Fetching cleaned chunks from MongoDB...")
-    funds = get_all_funds_with_chunks()
-    print(f"📦 Found {len(funds)} funds with cleaned chunks.")
-
-    for fund in tqdm(funds, desc="🚀 Embedding chunks"):
-        fund_name = fund["fund_name"]
-        chunks = fund.get("cleaned_chunks", [])
+    version = store_fund_embeddings(fund_name, all_embeddings)
+    upsert_fund(fund_name, chunks, all_embeddings, version=version)
+    print(f"✅ Stored {len(all_embeddings)} embeddings for {fund_name}")
+    return all_embeddings
 
-        all_embeddings = []
-        for chunk in chunks:
-            embedding = generate_embedding(chunk)
-            all_embeddings.append(embedding)
+def main(fund_names=None):
+    """Embed every fund with chunks, or only the given fund_names (e.g. freshly uploaded ones)."""
+    print("🔄 Fetching cleaned chunks from MongoDB...")
+    names = get_fund_names_with_chunks(fund_names)
+    print(f"📦 Found {len(names)} funds with cleaned chunks.")
 
-        update_fund_field(fund_name, "embeddings", all_embeddings)
-        print(f"✅ Stored {len(all_embeddings)} embeddings for {fund_name}")
+    for fund_name in tqdm(names, desc="🚀 Embedding chunks"):
+        embed_fund(fund_name, get_chunk_texts(fund_name))
 
     print("🏁 All fund embeddings stored in MongoDB.")
 if __name__ == "__main__":
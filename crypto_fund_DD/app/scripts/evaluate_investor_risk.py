@@ -1,14 +1,8 @@
-from langchain.llms import Ollama
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-
-# Initialize Local LLM
-llm = Ollama(model="llama3.1")  
+# langchain is imported and the chain built on first use, so importing this module is cheap
+_INVESTOR_RISK_CHAIN = None
 
 # Enhanced Prompt
-investor_risk_prompt = PromptTemplate(
-    input_variables=["answer"],
-    template="""
+INVESTOR_RISK_TEMPLATE = """
 You are acting as a Senior Investment Risk Analyst.
 
 Your task:
@@ -36,13 +30,22 @@ Answer:
 ---
 ONLY output Positive, Negative, Partial, or Missing (without quotes).
 """
-)
 
 # Chain Setup
-investor_risk_chain = LLMChain(llm=llm, prompt=investor_risk_prompt)
+def get_investor_risk_chain():
+    global _INVESTOR_RISK_CHAIN
+    if _INVESTOR_RISK_CHAIN is None:
+        from langchain.llms import Ollama
+        from langchain.prompts import PromptTemplate
+        from langchain.chains import LLMChain
+
+        llm = Ollama(model="llama3.1")  # Initialize Local LLM
+        investor_risk_prompt = PromptTemplate(input_variables=["answer"], template=INVESTOR_RISK_TEMPLATE)
+        _INVESTOR_RISK_CHAIN = LLMChain(llm=llm, prompt=investor_risk_prompt)
+    return _INVESTOR_RISK_CHAIN
 
 # Evaluation Function
 def evaluate_investor_risk(answer: str) -> str:
     """Evaluate the answer professionally: Positive, Negative, Partial, Missing."""
-    result = investor_risk_chain.run(answer=answer)
+    result = get_investor_risk_chain().run(answer=answer)
     return result.strip()
@@ -3,8 +3,11 @@
 import os
 import re
 import io
-import unicodedata
+import json
+import hashlib
+from collections import deque
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 import fitz  # PyMuPDF for PDF
 from PIL import Image
@@ -12,7 +15,11 @@ import pytesseract
 import pdfplumber
 import pandas as pd
 from langdetect import detect
-from lib.mongo_helpers import update_fund_field
+from lib.mongo_helpers import (
+    update_fund_field, insert_fund_metadata, get_fund_by_name, find_fund_by_content_hash, replace_fund_pages
+)
+from lib.disk_cache import DiskCache
+from scripts.text_cleaner import clean_text, iter_clean_blocks
 
 # --- Configure Tesseract if needed ---
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
@@ -24,6 +31,24 @@ EXTRACTED_DIR = "data/extracted_data/"          # Permanent archive for all clea
 os.makedirs(NEW_EXTRACTED_DIR, exist_ok=True)
 os.makedirs(EXTRACTED_DIR, exist_ok=True)
 
+# --- Parallel ingestion ---
+MAX_INGEST_WORKERS = os.cpu_count() or 1
+
+# --- OCR policy for scanned PDF pages ---
+OCR_DPI = int(os.environ.get("OCR_DPI", 300))          # render resolution for normal-sized pages
+OCR_MIN_DPI = 150                                      # never go below this (Tesseract accuracy drops fast)
+OCR_MAX_PIXELS = 12_000_000                            # oversized pages are rendered at a lower DPI to stay under this
+OCR_MAX_WORKERS = os.cpu_count() or 1                  # OCR processes per PDF
+OCR_LANG = "eng"
+OCR_CONFIG = ""
+
+# --- Streaming ---
+LANGUAGE_SAMPLE_CHARS = 20_000  # language is detected on the start of the cleaned text
+
+# --- OCR cache (same rendered pixels + same OCR settings -> same text) ---
+OCR_CACHE_PATH = "data/cache/ocr.sqlite"
+_OCR_CACHE = DiskCache(OCR_CACHE_PATH, max_entries=100_000)
+
 # ----------------- Utility Functions -----------------
 
 def detect_language(text: str) -> str:
@@ -32,44 +57,31 @@ def detect_language(text: str) -> str:
     except:
         return "unknown"
 
-def extract_tables_from_text(text: str) -> list:
-    tables = []
+def iter_tables(lines):
+    """Group runs of table-looking lines (3+ spaces or a tab) into tables, as the lines stream in."""
     potential_table = []
-    for line in text.splitlines():
+    for line in lines:
         if re.search(r'\s{3,}|\t', line):
             potential_table.append(line)
         else:
             if potential_table:
-                tables.append("\n".join(potential_table))
+                yield "\n".join(potential_table)
                 potential_table = []
     if potential_table:
-        tables.append("\n".join(potential_table))
-    return tables
+        yield "\n".join(potential_table)
 
-def clean_text(raw_text: str) -> str:
-    text = unicodedata.normalize("NFKD", raw_text)
-    text = re.sub(r"(page\s*\d+(\s*of\s*\d+)?)", "", text, flags=re.IGNORECASE)
-    text = re.sub(r"(confidential|proprietary|internal use only)", "", text, flags=re.IGNORECASE)
-    text = re.sub(r'(?m)^[^\n]{1,20}\n', '', text)
-    text = re.sub(r'(?m)^\s*(\d{1,2}([-/]\d{1,2}){1,2})\s*$', '', text)
-    text = re.sub(r'[_*\-=~•■◆►¤✦●⚫️★☆]+', ' ', text)
-    text = re.sub(r'^[\s]*[\-\*•➤►▪️•⚫️●>]+[\s]+', '- ', text, flags=re.MULTILINE)
-    text = re.sub(r'^(\d+)\.\s*', r'\1. ', text, flags=re.MULTILINE)
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    lines = text.splitlines()
-    new_lines = []
-    previous_line = None
-    for line in lines:
-        if line != previous_line:
-            new_lines.append(line)
-        previous_line = line
-    text = "\n".join(new_lines)
-    text = re.sub(r'(\d+)\.([A-Z])', r'\1. \2', text)
-    text = re.sub(r'(?m)^[ \t]+', '', text)
-    text = re.sub(r'(?m)[ \t]+$', '', text)
-    text = re.sub(r'[ \t]{2,}', ' ', text)
-    text = text.strip()
-    return text
+def extract_tables_from_text(text: str) -> list:
+    return list(iter_tables(text.splitlines()))
+
+def iter_lines(pieces):
+    """Split a stream of text pieces into lines on \\n, across piece boundaries."""
+    carry = ""
+    for piece in pieces:
+        lines = (carry + piece).split("\n")
+        carry = lines.pop()
+        yield from lines
+    if carry:
+        yield carry
 
 def clean_csv(df: pd.DataFrame) -> pd.DataFrame:
     df = df.dropna(how="all").dropna(axis=1, how="all")
@@ -84,19 +96,80 @@ def clean_excel(df: pd.DataFrame) -> pd.DataFrame:
 
 # ----------------- Extraction Functions -----------------
 
-def extract_text_from_pdf(file) -> str:
-    text = ""
-    pdf = fitz.open(stream=file.read(), filetype="pdf")
-    for page in pdf:
-        page_text = page.get_text()
-        if not page_text.strip():
-            # Scanned PDF page, use OCR
-            pix = page.get_pixmap(dpi=300)
-            img = Image.open(io.BytesIO(pix.tobytes()))
-            page_text = pytesseract.image_to_string(img)
-        text += page_text + "\n"
+def ocr_dpi_for_page(page) -> int:
+    """OCR_DPI, lowered for pages so large that rendering them would exceed OCR_MAX_PIXELS."""
+    width_in, height_in = page.rect.width / 72, page.rect.height / 72
+    pixels = width_in * height_in * OCR_DPI ** 2
+    if pixels <= OCR_MAX_PIXELS:
+        return OCR_DPI
+    return max(OCR_MIN_DPI, int(OCR_DPI * (OCR_MAX_PIXELS / pixels) ** 0.5))
+
+def ocr_cache_key(pixels, layout, dpi=None) -> str:
+    """sha256 over the raw pixel buffer, its layout and every setting that changes the OCR output."""
+    digest = hashlib.sha256(f"{OCR_LANG}\n{OCR_CONFIG}\n{dpi}\n{layout}\n".encode("utf-8"))
+    digest.update(pixels)
+    return digest.hexdigest()
+
+def _cached_ocr(key, load_image) -> str:
+    cached = _OCR_CACHE.get(key)
+    if cached is not None:
+        return cached.decode("utf-8")
+    text = pytesseract.image_to_string(load_image(), lang=OCR_LANG, config=OCR_CONFIG)
+    _OCR_CACHE.set(key, text.encode("utf-8"))
     return text
 
+def ocr_pdf_page(page) -> str:
+    """Render one page and OCR it; only this page's image is held in memory."""
+    dpi = ocr_dpi_for_page(page)
+    pix = page.get_pixmap(dpi=dpi)
+    key = ocr_cache_key(pix.samples, f"{pix.width}x{pix.height}x{pix.n}", dpi)
+    return _cached_ocr(key, lambda: Image.open(io.BytesIO(pix.tobytes())))
+
+# --- OCR worker processes (each opens the PDF once, then renders pages on demand) ---
+_OCR_PDF = None
+
+def _init_ocr_worker(pdf_bytes):
+    global _OCR_PDF
+    _OCR_PDF = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+def _ocr_page_worker(page_number):
+    return ocr_pdf_page(_OCR_PDF[page_number])
+
+def iter_pdf_pages(data):
+    """
+    Yield (page_number, text) for every page of a PDF, in order, as soon as it is ready.
+    Scanned pages (no text layer) are OCR'd on a process pool while later pages are read;
+    at most about two pages per OCR worker are held in memory.
+    """
+    pdf = fitz.open(stream=data, filetype="pdf")
+    max_pending = 2 * OCR_MAX_WORKERS
+    pending = deque()  # (page_number, text or Future) in page order
+    pool = None
+    try:
+        for i, page in enumerate(pdf):
+            page_text = page.get_text()
+            if not page_text.strip():  # Scanned PDF page, use OCR
+                if OCR_MAX_WORKERS <= 1:
+                    page_text = ocr_pdf_page(page)
+                else:
+                    if pool is None:
+                        pool = ProcessPoolExecutor(max_workers=OCR_MAX_WORKERS, initializer=_init_ocr_worker, initargs=(data,))
+                    page_text = pool.submit(_ocr_page_worker, i)
+            pending.append((i + 1, page_text))
+
+            while pending and (isinstance(pending[0][1], str) or len(pending) > max_pending):
+                page_number, page_text = pending.popleft()
+                yield page_number, page_text if isinstance(page_text, str) else page_text.result()
+        while pending:
+            page_number, page_text = pending.popleft()
+            yield page_number, page_text if isinstance(page_text, str) else page_text.result()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+def extract_text_from_pdf(file) -> str:
+    return "".join(page_text + "\n" for _, page_text in iter_pdf_pages(file.read()))
+
 def extract_tables_from_pdf(file) -> list:
     tables = []
     with pdfplumber.open(file) as pdf:
@@ -108,7 +181,8 @@ def extract_tables_from_pdf(file) -> list:
 
 def extract_text_from_image(file) -> str:
     img = Image.open(file)
-    return pytesseract.image_to_string(img)
+    key = ocr_cache_key(img.tobytes(), f"{img.width}x{img.height}x{img.mode}")
+    return _cached_ocr(key, lambda: img)
 
 def extract_text_from_txt(file) -> str:
     return file.read().decode('utf-8')
@@ -118,81 +192,195 @@ def extract_text_from_csv(file) -> str:
     df = clean_csv(df)
     return df.to_string(index=False)
 
-def extract_text_from_excel(file) -> str:
+def iter_excel_sheets(file):
     dfs = pd.read_excel(file, sheet_name=None)
-    text = ""
     for sheet_name, df in dfs.items():
         df = clean_excel(df)
-        text += f"\n--- Sheet: {sheet_name} ---\n"
-        text += df.to_string(index=False) + "\n"
-    return text
+        yield f"\n--- Sheet: {sheet_name} ---\n" + df.to_string(index=False) + "\n"
 
-def detect_file_type_and_extract(file) -> str:
+def extract_text_from_excel(file) -> str:
+    return "".join(iter_excel_sheets(file))
+
+def iter_file_pages(file):
+    """
+    Yield (page_number, text) for one uploaded file: PDF pages, Excel sheets, or the whole
+    file as page 1 for the other types. Joining the texts gives detect_file_type_and_extract().
+    """
     name = file.name.lower()
 
     if name.endswith(".pdf"):
-        return extract_text_from_pdf(file)
+        for page_number, page_text in iter_pdf_pages(file.read()):
+            yield page_number, page_text + "\n"
     elif name.endswith((".png", ".jpg", ".jpeg")):
-        return extract_text_from_image(file)
+        yield 1, extract_text_from_image(file)
     elif name.endswith(".txt"):
-        return extract_text_from_txt(file)
+        yield 1, extract_text_from_txt(file)
     elif name.endswith(".csv"):
-        return extract_text_from_csv(file)
+        yield 1, extract_text_from_csv(file)
     elif name.endswith(".xlsx"):
-        return extract_text_from_excel(file)
+        yield from enumerate(iter_excel_sheets(file), start=1)
     else:
-        return "Unsupported file type."
+        yield 1, "Unsupported file type."
 
-# ----------------- Main Pipeline -----------------
+def detect_file_type_and_extract(file) -> str:
+    return "".join(page_text for _, page_text in iter_file_pages(file))
 
-def process_uploaded_file(uploaded_file):
+# ----------------- Upload Deduplication -----------------
+
+def file_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def register_uploads(uploaded_files) -> list:
     """
-    Full professional pipeline: Extract -> Clean -> Detect Tables -> Detect Language -> Save all.
+    Decide, per uploaded file, how much ingestion work it needs by comparing content hashes:
+      new        -> unknown name and bytes: fund registered, needs processing
+      changed    -> known name, different bytes: needs re-processing
+      unchanged  -> same name, same bytes already ingested: skip
+      duplicate  -> same bytes already ingested under another fund name: skip
+    Returns [{"file", "fund_name", "status", "content_hash"}] in upload order.
     """
+    uploads = []
+    seen = {}  # content_hash -> fund_name, catches copies inside the same batch
+    for uploaded_file in uploaded_files:
+        content_hash = file_sha256(uploaded_file.getvalue())
+        fund_name = os.path.splitext(uploaded_file.name)[0]
 
-    base_name = os.path.splitext(uploaded_file.name)[0]
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        ingested = find_fund_by_content_hash(content_hash)
+        if content_hash in seen or ingested:
+            owner = seen.get(content_hash) or ingested["fund_name"]
+            status = "unchanged" if owner == fund_name else "duplicate"
+            fund_name = owner
+        elif get_fund_by_name(fund_name):
+            status = "changed"
+        else:
+            insert_fund_metadata(fund_name, uploaded_file.name, content_hash)
+            status = "new"
 
-    # Extract raw text
-    raw_text = detect_file_type_and_extract(uploaded_file)
+        seen[content_hash] = fund_name
+        uploads.append({"file": uploaded_file, "fund_name": fund_name, "status": status, "content_hash": content_hash})
+    return uploads
 
-    # Clean text
-    cleaned_text = clean_text(raw_text)
+# ----------------- Main Pipeline -----------------
 
-    # Detect tables
-    tables = extract_tables_from_text(cleaned_text)
+def _save_raw_pages(pages, raw_file, pages_file):
+    """Append each raw page to the raw text file and to the page file (one JSON line per page), passing the text on."""
+    for page_number, page_text in pages:
+        raw_file.write(page_text)
+        pages_file.write(json.dumps({"page": page_number, "text": page_text}, ensure_ascii=False) + "\n")
+        yield page_text
 
-    # Detect language
-    detected_language = detect_language(cleaned_text)
+def _save_blocks(blocks, f):
+    for block in blocks:
+        f.write(block)
+        yield block
 
-    # Save raw text into NEW extracted folder
-    raw_path = os.path.join(NEW_EXTRACTED_DIR, f"{base_name}_{timestamp}_raw.txt")
-    with open(raw_path, "w", encoding="utf-8") as f:
-        f.write(raw_text)
+def _extract_and_save(file_name, data):
+    """
+    Extract -> Clean -> Detect Tables -> Detect Language -> Save files, for one file's bytes.
+    Pages stream through every step straight to disk, so only a few pages are in memory
+    at a time whatever the document size. Touches only the local disk, so it can run in a
+    worker process.
+    """
+    file = io.BytesIO(data)
+    file.name = file_name
 
-    # Save cleaned text into NEW extracted folder
+    base_name = os.path.splitext(file_name)[0]
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    raw_path = os.path.join(NEW_EXTRACTED_DIR, f"{base_name}_{timestamp}_raw.txt")
+    pages_path = os.path.join(NEW_EXTRACTED_DIR, f"{base_name}_{timestamp}_pages.jsonl")
     clean_path = os.path.join(NEW_EXTRACTED_DIR, f"{base_name}_{timestamp}_cleaned.txt")
-    with open(clean_path, "w", encoding="utf-8") as f:
-        f.write(cleaned_text)
-    # 🔽 Add this line right after saving raw_text to file
-    update_fund_field(base_name, "raw_text", raw_text)
-    # Save tables if any
+
     tables_paths = []
-    if tables:
-        for idx, table in enumerate(tables):
+    with open(raw_path, "w", encoding="utf-8") as raw_file, \
+         open(pages_path, "w", encoding="utf-8") as pages_file, \
+         open(clean_path, "w", encoding="utf-8") as clean_file:
+        # Extract raw pages -> clean them -> detect tables, all in one pass
+        raw_pages = _save_raw_pages(iter_file_pages(file), raw_file, pages_file)
+        cleaned_blocks = _save_blocks(iter_clean_blocks(raw_pages), clean_file)
+
+        # Save tables if any
+        for idx, table in enumerate(iter_tables(iter_lines(cleaned_blocks))):
             table_path = os.path.join(NEW_EXTRACTED_DIR, f"{base_name}_{timestamp}_table_{idx+1}.txt")
             with open(table_path, "w", encoding="utf-8") as f:
                 f.write(table)
             tables_paths.append(table_path)
 
+    # Detect language
+    with open(clean_path, "r", encoding="utf-8") as f:
+        detected_language = detect_language(f.read(LANGUAGE_SAMPLE_CHARS))
+
     # Save metadata (language)
     meta_path = os.path.join(NEW_EXTRACTED_DIR, f"{base_name}_{timestamp}_meta.txt")
     with open(meta_path, "w", encoding="utf-8") as f:
         f.write(f"Detected Language: {detected_language}\n")
 
     return {
+        "content_hash": file_sha256(data),
         "raw_text_path": raw_path,
+        "pages_path": pages_path,
         "cleaned_text_path": clean_path,
         "tables_paths": tables_paths,
         "language": detected_language
     }
+
+def _read_pages(pages_path):
+    with open(pages_path, "r", encoding="utf-8") as f:
+        for line in f:
+            page = json.loads(line)
+            yield page["page"], page["text"]
+
+def _store_result(file_name, result):
+    """Stream the extracted pages into MongoDB and record the hash they came from (parent process only)."""
+    base_name = os.path.splitext(file_name)[0]
+    result["page_count"] = replace_fund_pages(base_name, _read_pages(result["pages_path"]))
+    update_fund_field(base_name, "content_hash", result["content_hash"])  # only once extraction succeeded
+    return result
+
+def _init_ingest_worker(ocr_workers):
+    global OCR_MAX_WORKERS
+    OCR_MAX_WORKERS = ocr_workers
+
+def process_uploaded_file(uploaded_file):
+    """
+    Full professional pipeline: Extract -> Clean -> Detect Tables -> Detect Language -> Save all.
+    """
+    result = _extract_and_save(uploaded_file.name, uploaded_file.getvalue())
+    return _store_result(uploaded_file.name, result)
+
+def process_uploaded_files(uploaded_files, max_workers=MAX_INGEST_WORKERS, on_progress=None):
+    """
+    Run the pipeline for many files at once on a process pool (one file per worker).
+    on_progress(done, total, file_name, error) is called in this process as each file
+    finishes. Returns {file_name: result}; failed files map to {"error": message}.
+    """
+    files = [(f.name, f.getvalue()) for f in uploaded_files]
+    total = len(files)
+    results = {}
+
+    def finish(file_name, result=None, error=None):
+        if error is None:
+            results[file_name] = _store_result(file_name, result)
+        else:
+            print(f"❌ Failed to process {file_name}: {error}")
+            results[file_name] = {"error": str(error)}
+        if on_progress:
+            on_progress(len(results), total, file_name, error)
+
+    workers = max(1, min(max_workers, total))
+    if workers == 1:  # nothing to parallelize; skip the pool start-up cost
+        for file_name, data in files:
+            try:
+                finish(file_name, _extract_and_save(file_name, data))
+            except Exception as e:
+                finish(file_name, error=e)
+        return results
+
+    ocr_workers = max(1, OCR_MAX_WORKERS // workers)  # share the cores between files instead of oversubscribing
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_ingest_worker, initargs=(ocr_workers,)) as pool:
+        futures = {pool.submit(_extract_and_save, file_name, data): file_name for file_name, data in files}
+        for future in as_completed(futures):
+            try:
+                finish(futures[future], future.result())
+            except Exception as e:
+                finish(futures[future], error=e)
+    return results
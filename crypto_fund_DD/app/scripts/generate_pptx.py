@@ -10,10 +10,10 @@ from pptx.dml.color import RGBColor
 from pptx.chart.data import CategoryChartData
 from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
 from collections import defaultdict
-import spacy
 import numpy as np
 import logging
 from tqdm import tqdm
+from lib.nlp_models import parse, VECTOR_PIPES
 
 # --- Logging Setup ---
 os.makedirs("output", exist_ok=True)
@@ -92,8 +92,6 @@ IMPORTANCE_WEIGHTS = {
 	"Future Outlook": 0.08
 }
 
-nlp = spacy.load("en_core_web_sm")
-
 # --- Helper Functions ---
 def get_next_output_filename(base_name):
 	os.makedirs(OUTPUT_DIR, exist_ok=True)
@@ -188,7 +186,6 @@ def add_branding(slide, current_tag="General"):
 
 # --- Analysis Functions ---
 def detect_negative_sentiment(text):
-	doc = nlp(text.lower())
 	negative_indicators = ["not mentioned", "lacking", "insufficient", "unavailable", "no details", "unknown", "weak", "incomplete"]
 	result = any(indicator in text.lower() for indicator in negative_indicators)
 	logger.info(f"Negative sentiment check for '{text[:30]}...': {result}")
@@ -197,10 +194,10 @@ def detect_negative_sentiment(text):
 def analyze_tag_text(tag, findings, issues):
 	tag_text = " ".join(findings) + " " + " ".join(issues)
 	criteria = DUE_DILIGENCE_CRITERIA[tag]
-	doc = nlp(tag_text.lower())
+	doc = parse(tag_text.lower(), keep=VECTOR_PIPES)
 	found_criteria = []
 	for criterion in criteria:
-		criterion_doc = nlp(criterion.lower())
+		criterion_doc = parse(criterion.lower(), keep=VECTOR_PIPES)
 		similarity = doc.similarity(criterion_doc)
 		keyword_match = criterion.lower() in tag_text.lower()
 		if similarity >= 0.7 or keyword_match:
@@ -1,55 +1,94 @@
-# --- graph_rag_retriever.py (MongoDB version, no local FAISS files) ---
+# --- graph_rag_retriever.py (MongoDB version, index served by index_manager) ---
 
+import time
+import threading
 import numpy as np
 import faiss
-import ollama
 from tqdm import tqdm
-from lib.mongo_helpers import get_all_funds_with_embeddings
+from lib.embedding_client import embed_text
+from scripts.index_manager import get_chunk_lookup, get_chunk_vectors, resolve_funds, search
+from lib.graph_store import load_graph, graph_version
 
 TOP_K_FAISS = 100
 TOP_K_FINAL = 15
 MAX_TOKENS_CONTEXT = 3500
-FAISS_INDEX = None
-CHUNK_LOOKUP = {}
-
-# --- Build FAISS Index in-memory from MongoDB ---
-def build_faiss_index():
-    global FAISS_INDEX, CHUNK_LOOKUP
-    print("🔄 Building FAISS index from MongoDB...")
-    
-    funds = get_all_funds_with_embeddings()
-    all_embeddings = []
-    all_ids = []
-
-    for fund in funds:
-        fund_name = fund["fund_name"]
-        chunks = fund.get("cleaned_chunks", [])
-        embeddings = fund.get("embeddings", [])
-
-        for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-            chunk_id = f"{fund_name}_chunk_{i+1}"
-            all_embeddings.append(emb)
-            all_ids.append(chunk_id)
-            CHUNK_LOOKUP[chunk_id] = chunk
-
-    if not all_embeddings:
-        raise RuntimeError("❌ No embeddings found in MongoDB to build FAISS index.")
-
-    xb = np.array(all_embeddings).astype("float32")
-    faiss.normalize_L2(xb)
-
-    index = faiss.IndexFlatIP(xb.shape[1])
-    index.add(xb)
-
-    FAISS_INDEX = index
-    print(f"✅ FAISS index built with {len(all_ids)} chunks.")
-    return all_ids
+
+# --- Graph expansion ---
+RETRIEVAL_MODE = "graph"       # "graph": FAISS seeds expanded through the concept graph and re-ranked; "flat": FAISS only
+GRAPH_SEEDS = 20               # best-scoring chunks expanded at each hop
+GRAPH_HOPS = 2
+GRAPH_FANOUT = 5               # strongest neighbours followed per chunk
+GRAPH_WEIGHT = 0.3             # share of the graph score in the combined score
+GRAPH_BUDGET_MS = 50           # expansion + re-ranking time per query; past it, what was reached so far is ranked
+
+_GRAPH = None                  # memory-mapped GraphStore, rows ordered strongest neighbour first
+_GRAPH_VERSION = None
+_GRAPH_LOCK = threading.Lock()
 
 # --- Retrieve matching chunk IDs from FAISS ---
-def semantic_retrieve(question_embedding, all_ids):
+def semantic_retrieve(question_embedding, fund_names=None, with_scores=False):
+    """Exact top TOP_K_FAISS chunks, searching only the partitions of fund_names (all funds if None)."""
     faiss.normalize_L2(question_embedding)
-    D, I = FAISS_INDEX.search(question_embedding, TOP_K_FAISS)
-    return [all_ids[i] for i in I[0] if i < len(all_ids)]
+    hits = search(question_embedding, TOP_K_FAISS, fund_names)
+    return hits if with_scores else [cid for cid, _ in hits]
+
+# --- Concept graph (re-opened when build_graph saves a new version) ---
+def get_graph():
+    global _GRAPH, _GRAPH_VERSION
+    with _GRAPH_LOCK:
+        version = graph_version()
+        if version != _GRAPH_VERSION:
+            _GRAPH, _GRAPH_VERSION = None, version
+            if version is not None:
+                try:
+                    _GRAPH = load_graph()
+                except Exception as e:
+                    print(f"⚠️ Failed to load concept graph: {e}")
+                    _GRAPH_VERSION = None
+        return _GRAPH
+
+def expand_through_graph(seeds, graph, deadline, hops=GRAPH_HOPS):
+    """
+    Graph score of every chunk reached from the seeds {chunk_id: similarity}: the best
+    seed similarity times the edge weights along the way. Stops early at the deadline.
+    """
+    graph_scores = {}
+    frontier = sorted(seeds.items(), key=lambda cs: -cs[1])[:GRAPH_SEEDS]
+    for _ in range(hops):
+        reached = {}
+        for node, score in frontier:
+            if time.perf_counter() > deadline:
+                return graph_scores, False
+            for neighbour, weight in graph.neighbours_of(node, GRAPH_FANOUT):
+                if score * weight > reached.get(neighbour, 0):
+                    reached[neighbour] = score * weight
+        for node, score in reached.items():
+            if score > graph_scores.get(node, 0):
+                graph_scores[node] = score
+        frontier = sorted(reached.items(), key=lambda cs: -cs[1])[:GRAPH_SEEDS]
+    return graph_scores, True
+
+def graph_rerank(question_embedding, hits, graph, fund_names=None, budget_ms=GRAPH_BUDGET_MS):
+    """
+    Re-rank FAISS hits together with the chunks the graph reaches from them (within fund_names
+    if given), by (1 - GRAPH_WEIGHT) * question similarity + GRAPH_WEIGHT * graph score.
+    question_embedding must already be L2-normalised (semantic_retrieve does it).
+    """
+    deadline = time.perf_counter() + budget_ms / 1000
+    similarity = dict(hits)
+    graph_scores, complete = expand_through_graph(similarity, graph, deadline)
+
+    # Chunks only the graph found are scored against the question from their stored vectors
+    found, vectors = get_chunk_vectors([cid for cid in graph_scores if cid not in similarity], fund_names)
+    if found:
+        similarity.update(zip(found, (vectors @ question_embedding[0]).tolist()))
+
+    combined = {cid: (1 - GRAPH_WEIGHT) * sim + GRAPH_WEIGHT * graph_scores.get(cid, 0)
+                for cid, sim in similarity.items()}
+    ranked = sorted(combined, key=lambda cid: -combined[cid])
+    note = "" if complete else " (latency budget reached)"
+    print(f"🕸️ Graph expansion: {len(hits)} seeds -> {len(ranked)} candidates{note}.")
+    return ranked
 
 # --- Trim chunk context to token limit ---
 def trim_context(chunks, max_tokens=MAX_TOKENS_CONTEXT):
@@ -64,29 +103,44 @@ def trim_context(chunks, max_tokens=MAX_TOKENS_CONTEXT):
     return context.strip()
 
 # --- Main Retrieval Function ---
-def retrieve_context(question, source_filter=None):
+def retrieve_context(question, source_filter=None, mode=RETRIEVAL_MODE, raise_errors=False):
+    """
+    Context for question, or None if nothing relevant is found. With raise_errors, a failure to
+    embed the question is raised instead, so callers can tell it apart from "no context".
+    """
     print(f"\n🔎 Building context for question: {question}")
 
-    all_ids = build_faiss_index()
+    chunk_lookup = get_chunk_lookup()
+
+    # Fund scope: search only the matching funds' partitions, never other funds' documents
+    fund_names = None
+    if source_filter:
+        fund_names = resolve_funds(source_filter)
+        if not fund_names:
+            print(f"⚠️ Source Filter: no fund matches '{source_filter}', no context.")
+            return None
+        print(f"🛡️ Source Filter: searching {len(fund_names)} fund(s) matching '{source_filter}'.")
 
     try:
-        response = ollama.embeddings(model="nomic-embed-text", prompt=question)
-        query_emb = np.array([response["embedding"]], dtype="float32")
+        query_emb = embed_text(question).reshape(1, -1)
     except Exception as e:
         print(f"❌ Failed to embed question: {e}")
+        if raise_errors:
+            raise
         return None
 
     # Semantic search
-    faiss_ids = semantic_retrieve(query_emb, all_ids)
+    hits = semantic_retrieve(query_emb, fund_names, with_scores=True)
+    faiss_ids = [cid for cid, _ in hits]
     print(f"🔍 Retrieved {len(faiss_ids)} chunks from FAISS.")
 
-    if source_filter:
-        filtered = [cid for cid in faiss_ids if cid.startswith(source_filter)]
-        print(f"🛡️ Source Filter: {len(filtered)} remain.")
-        if filtered:
-            faiss_ids = filtered
+    # Graph expansion and re-ranking
+    if mode == "graph":
+        graph = get_graph()
+        if graph is not None and graph.n_edges:
+            faiss_ids = graph_rerank(query_emb, hits, graph, fund_names)
 
-    selected_chunks = [CHUNK_LOOKUP[cid] for cid in faiss_ids if cid in CHUNK_LOOKUP]
+    selected_chunks = [chunk_lookup[cid] for cid in faiss_ids if cid in chunk_lookup]
     context = trim_context(selected_chunks[:TOP_K_FINAL])
 
     if len(context.strip()) < 30:
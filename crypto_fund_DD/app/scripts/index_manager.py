@@ -0,0 +1,282 @@
+# --- index_manager.py (long-lived FAISS indexes, one partition per fund, persisted to disk) ---
+
+import os
+import json
+import time
+import hashlib
+import threading
+import numpy as np
+import faiss
+from lib.mongo_helpers import get_chunks_and_embeddings, get_embedding_versions, chunk_id
+
+# --- Settings ---
+# Each fund is stored as funds/<file id>.index (its vectors) and funds/<file id>.json (name,
+# version, chunk texts); nothing on disk is shared between funds.
+INDEX_DIR = "data/faiss/"
+FUND_INDEX_DIR = os.path.join(INDEX_DIR, "funds")
+FUND_FILE_PREFIX = "fund_"
+LEGACY_INDEX_FILES = [os.path.join(INDEX_DIR, name) for name in ("chunks.index", "chunks_meta.json", "funds_meta.json")]
+CHECK_INTERVAL = 30  # seconds between MongoDB freshness checks
+
+# --- In-memory state (shared by every retrieval call in the process) ---
+# Each fund has its own exact inner-product index whose row i is the fund's chunk i, so a
+# fund-scoped search only touches that fund's vectors.
+_FUND_INDEXES = {}    # fund_name -> faiss.IndexFlatIP
+_FUND_VERSIONS = {}   # fund_name -> "<embeddings_version>:<n_embeddings>"
+_FUND_CHUNKS = {}     # fund_name -> list of chunk texts
+_CHUNK_LOOKUP = {}    # chunk_id -> chunk text
+_CHUNK_POSITIONS = {} # chunk_id -> (fund_name, row in the fund's index)
+_DIM = None
+_LAST_CHECK = None
+_LOCK = threading.RLock()
+
+def _version_key(version, n_embeddings):
+    return f"{version}:{n_embeddings}"
+
+def _fund_file_id(fund_name):
+    """File name stem of a fund's partition, derived from its name so no process has to allocate ids."""
+    return FUND_FILE_PREFIX + hashlib.sha1(fund_name.encode("utf-8")).hexdigest()[:16]
+
+def _fund_paths(fund_name):
+    stem = os.path.join(FUND_INDEX_DIR, _fund_file_id(fund_name))
+    return stem + ".index", stem + ".json"
+
+def _tmp_path(path):
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def _register_chunks(fund_name, chunks):
+    for i, chunk in enumerate(chunks):
+        cid = chunk_id(fund_name, i)
+        _CHUNK_LOOKUP[cid] = chunk
+        _CHUNK_POSITIONS[cid] = (fund_name, i)
+
+# --- Per-fund mutations (callers hold _LOCK) ---
+def _remove(fund_name):
+    for i in range(len(_FUND_CHUNKS.get(fund_name, []))):
+        _CHUNK_LOOKUP.pop(chunk_id(fund_name, i), None)
+        _CHUNK_POSITIONS.pop(chunk_id(fund_name, i), None)
+    _FUND_INDEXES.pop(fund_name, None)
+    _FUND_CHUNKS.pop(fund_name, None)
+    _FUND_VERSIONS.pop(fund_name, None)
+
+def _upsert(fund_name, chunks, embeddings, version_key):
+    global _DIM
+    _remove(fund_name)
+    n = min(len(chunks), len(embeddings))
+    if n == 0:
+        return
+
+    xb = np.array(embeddings[:n], dtype="float32")  # copy: normalize_L2 works in place
+    faiss.normalize_L2(xb)
+
+    if _DIM is None or not _FUND_INDEXES:
+        _DIM = xb.shape[1]
+    elif xb.shape[1] != _DIM:
+        raise ValueError(f"❌ Embedding size {xb.shape[1]} for {fund_name} does not match index size {_DIM}.")
+
+    index = faiss.IndexFlatIP(xb.shape[1])
+    index.add(xb)
+    _FUND_INDEXES[fund_name] = index
+    _FUND_CHUNKS[fund_name] = list(chunks[:n])
+    _FUND_VERSIONS[fund_name] = version_key
+    _register_chunks(fund_name, _FUND_CHUNKS[fund_name])
+
+# --- Disk persistence ---
+def _save_fund(fund_name):
+    """
+    Write one fund's partition through temporary files and os.replace, vectors first: the .json
+    (which carries the version) is only replaced once the vectors it describes are in place.
+    """
+    index_path, meta_path = _fund_paths(fund_name)
+    faiss.write_index(_FUND_INDEXES[fund_name], _tmp_path(index_path))
+    os.replace(_tmp_path(index_path), index_path)
+    with open(_tmp_path(meta_path), "w", encoding="utf-8") as f:
+        json.dump({
+            "fund_name": fund_name,
+            "version": _FUND_VERSIONS[fund_name],
+            "chunks": _FUND_CHUNKS[fund_name]
+        }, f, ensure_ascii=False)
+    os.replace(_tmp_path(meta_path), meta_path)
+
+def _delete_fund_files(fund_name):
+    for path in _fund_paths(fund_name):
+        if os.path.exists(path):
+            os.remove(path)
+
+def save_index(fund_names=None):
+    """
+    Write the given funds' partitions (every fund in memory if None). A given fund that is no longer
+    in memory was removed, so its files are deleted; other funds' files are never touched, since
+    another process (the app or the batch CLI) may have written them.
+    """
+    with _LOCK:
+        os.makedirs(FUND_INDEX_DIR, exist_ok=True)
+        for fund_name in list(_FUND_INDEXES if fund_names is None else fund_names):
+            if fund_name in _FUND_INDEXES:
+                _save_fund(fund_name)
+            else:
+                _delete_fund_files(fund_name)
+        for name in os.listdir(FUND_INDEX_DIR):  # integer-numbered partitions from the shared bookkeeping
+            if name.endswith(".index") and not name.startswith(FUND_FILE_PREFIX):
+                os.remove(os.path.join(FUND_INDEX_DIR, name))
+        for path in LEGACY_INDEX_FILES:  # single global index / shared bookkeeping used before
+            if os.path.exists(path):
+                os.remove(path)
+
+def _load_fund(meta_path):
+    with open(meta_path, "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    index_path, expected_meta_path = _fund_paths(meta["fund_name"])
+    if os.path.normpath(meta_path) != os.path.normpath(expected_meta_path):
+        raise ValueError(f"{meta_path} does not belong to {meta['fund_name']}")
+    index = faiss.read_index(index_path)
+    if index.ntotal != len(meta["chunks"]):
+        raise ValueError(f"{index.ntotal} vectors for {len(meta['chunks'])} chunks")
+    return meta, index
+
+def load_index():
+    """Load every persisted fund partition. Returns True if any was loaded."""
+    global _DIM
+    if not os.path.isdir(FUND_INDEX_DIR):
+        return False
+    for name in sorted(os.listdir(FUND_INDEX_DIR)):
+        if not (name.startswith(FUND_FILE_PREFIX) and name.endswith(".json")):
+            continue
+        try:
+            meta, index = _load_fund(os.path.join(FUND_INDEX_DIR, name))
+        except Exception as e:
+            print(f"⚠️ Skipping persisted FAISS partition {name}: {e}")  # rebuilt from MongoDB by the sync
+            continue
+        fund_name = meta["fund_name"]
+        _FUND_INDEXES[fund_name] = index
+        _FUND_VERSIONS[fund_name] = meta["version"]
+        _FUND_CHUNKS[fund_name] = meta["chunks"]
+        _register_chunks(fund_name, meta["chunks"])
+    if not _FUND_INDEXES:
+        return False
+    _DIM = next(iter(_FUND_INDEXES.values())).d
+    print(f"✅ Loaded persisted FAISS index with {sum(i.ntotal for i in _FUND_INDEXES.values())} chunks in {len(_FUND_INDEXES)} funds.")
+    return True
+
+# --- Sync with MongoDB ---
+def sync_with_mongo():
+    """Apply only the per-fund differences between MongoDB and the in-memory index."""
+    versions = {
+        v["fund_name"]: _version_key(v.get("embeddings_version"), v["n_embeddings"])
+        for v in get_embedding_versions()
+    }
+    changed = []
+
+    for fund_name in list(_FUND_VERSIONS):
+        if fund_name not in versions:
+            _remove(fund_name)
+            changed.append(fund_name)
+
+    for fund_name, version_key in versions.items():
+        if _FUND_VERSIONS.get(fund_name) == version_key:
+            continue
+        print(f"🔄 Updating FAISS index for {fund_name}...")
+        chunks, embeddings = get_chunks_and_embeddings(fund_name)
+        _upsert(fund_name, chunks, embeddings, version_key)
+        changed.append(fund_name)
+
+    if changed:
+        save_index(changed)
+
+def _refresh():
+    """Load from disk once, then re-check MongoDB at most every CHECK_INTERVAL seconds (callers hold _LOCK)."""
+    global _LAST_CHECK
+    now = time.monotonic()
+    if not _FUND_INDEXES and _LAST_CHECK is None:
+        load_index()
+    if _LAST_CHECK is None or now - _LAST_CHECK >= CHECK_INTERVAL:
+        sync_with_mongo()
+        _LAST_CHECK = now
+    if not _FUND_INDEXES:
+        raise RuntimeError("❌ No embeddings found in MongoDB to build FAISS index.")
+
+# --- Public API ---
+def get_chunk_lookup():
+    """
+    chunk_id -> chunk text, served from memory. MongoDB is only re-checked every
+    CHECK_INTERVAL seconds, and only funds whose embeddings changed are re-read.
+    """
+    with _LOCK:
+        _refresh()
+        return _CHUNK_LOOKUP
+
+def _normalize_fund_name(name):
+    """Fund names compared as the pages once stored them: case, spaces and dashes ignored."""
+    return name.replace(" ", "").replace("-", "").lower()
+
+def resolve_funds(source_filter):
+    """
+    Funds a source filter refers to: the fund of that name, else every fund whose name starts with it
+    (names compared without case, spaces or dashes). Empty if no fund matches.
+    """
+    with _LOCK:
+        _refresh()
+        if source_filter in _FUND_INDEXES:
+            return [source_filter]
+        key = _normalize_fund_name(source_filter)
+        normalized = {fund_name: _normalize_fund_name(fund_name) for fund_name in _FUND_INDEXES}
+        exact = [fund_name for fund_name, name in normalized.items() if name == key]
+        return sorted(exact or (fund_name for fund_name, name in normalized.items() if name.startswith(key)))
+
+def search(query_embeddings, k, fund_names=None):
+    """
+    Exact top-k [(chunk_id, score), ...] for one L2-normalised query, searching only the
+    partitions of fund_names (every fund if None).
+    """
+    with _LOCK:
+        _refresh()
+        partitions = [(fund_name, _FUND_INDEXES[fund_name])
+                      for fund_name in (_FUND_INDEXES if fund_names is None else fund_names)
+                      if fund_name in _FUND_INDEXES]
+
+    # Searched outside the lock: an upsert replaces a fund's index object rather than changing it
+    scores, owners, rows = [], [], []
+    for fund_name, index in partitions:
+        D, I = index.search(query_embeddings, k)
+        found = I[0] >= 0
+        scores.append(D[0][found])
+        rows.append(I[0][found])
+        owners.extend([fund_name] * int(found.sum()))
+    if not owners:
+        return []
+    scores, rows = np.concatenate(scores), np.concatenate(rows)
+    best = np.argsort(-scores, kind="stable")[:k]
+    return [(chunk_id(owners[i], int(rows[i])), float(scores[i])) for i in best]
+
+def get_chunk_vectors(chunk_ids, fund_names=None):
+    """
+    (chunk ids found in the index, their unit-length vectors) for scoring chunks a search did not
+    return; limited to fund_names if given.
+    """
+    with _LOCK:
+        allowed = None if fund_names is None else set(fund_names)
+        found = [cid for cid in chunk_ids
+                 if cid in _CHUNK_POSITIONS and (allowed is None or _CHUNK_POSITIONS[cid][0] in allowed)]
+        if not found:
+            return [], np.empty((0, _DIM or 0), dtype="float32")
+        vectors = np.vstack([_FUND_INDEXES[fund_name].reconstruct(row)
+                             for fund_name, row in (_CHUNK_POSITIONS[cid] for cid in found)])
+        return found, vectors
+
+def upsert_fund(fund_name, chunks, embeddings, version=None):
+    """Add or replace one fund's vectors without touching the rest of the index."""
+    with _LOCK:
+        _upsert(fund_name, chunks, embeddings, _version_key(version, len(embeddings)))
+        save_index([fund_name])
+    print(f"✅ FAISS index updated for {fund_name} ({min(len(chunks), len(embeddings))} chunks).")
+
+def remove_fund(fund_name):
+    with _LOCK:
+        _remove(fund_name)
+        save_index([fund_name])
+
+def invalidate_index():
+    """Force a freshness check on the next lookup or search."""
+    global _LAST_CHECK
+    with _LOCK:
+        _LAST_CHECK = None
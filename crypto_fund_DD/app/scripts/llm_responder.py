@@ -1,27 +1,61 @@
 import ollama
+import os
 import time
 import json
 import re
-from scripts.evaluate_investor_risk import evaluate_investor_risk
+import hashlib
+from lib.disk_cache import DiskCache
 
 # --- Config ---
 LLM_MODEL = "llama3.1"
 MAX_RETRIES = 3
 RETRY_DELAY = 2  # seconds
+FAILED_RESPONSE = "❌ Failed to get a response from the local LLaMA model."
+
+# --- Response cache (identical model + messages -> stored answer) ---
+LLM_CACHE_PATH = "data/cache/llm_responses.sqlite"
+LLM_CACHE_TTL = int(os.environ.get("LLM_CACHE_TTL", 7 * 24 * 3600))  # seconds
+LLM_CACHE_MAX_ENTRIES = 20_000
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+
+_LLM_CACHE = DiskCache(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES, ttl=LLM_CACHE_TTL)
+
+def llm_cache_key(messages, model=LLM_MODEL):
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def llm_cache_stats():
+    """Hit/miss counters for this process plus the number of cached responses."""
+    return _LLM_CACHE.stats()
 
 # --- Retry Wrapper ---P
-def retry_llm(messages, model=LLM_MODEL):
+def retry_llm(messages, model=LLM_MODEL, use_cache=True, refresh=False):
+    """
+    Chat with the local model, retrying on errors.
+    Responses are cached by (model, messages): use_cache=False skips the cache entirely,
+    refresh=True ignores any stored answer but stores the new one.
+    """
+    use_cache = use_cache and LLM_CACHE_ENABLED
+    key = llm_cache_key(messages, model) if use_cache else None
+    if use_cache and not refresh:
+        cached = _LLM_CACHE.get(key)
+        if cached is not None:
+            return cached.decode("utf-8")
+
     for attempt in range(1, MAX_RETRIES + 1):
         try:
             response = ollama.chat(
                 model=model,
                 messages=messages
             )
-            return response['message']['content'].strip()
+            content = response['message']['content'].strip()
+            if use_cache and content:
+                _LLM_CACHE.set(key, content.encode("utf-8"))
+            return content
         except Exception as e:
             print(f"Retry {attempt} failed: {e}")
             time.sleep(RETRY_DELAY)
-    return "❌ Failed to get a response from the local LLaMA model."
+    return FAILED_RESPONSE  # never cached, so the next call tries the model again
     
 # --- Entity Detector ---
 def detect_entity_name(question, context):
@@ -43,13 +77,63 @@ def detect_entity_name(question, context):
         return candidates[0]
     return "Unknown Entity"
 
+# --- Streaming Retry Wrapper ---
+def retry_llm_stream(messages, model=LLM_MODEL, use_cache=True, refresh=False, status=None):
+    """
+    Same contract as retry_llm, but yields the answer piece by piece as the model
+    generates it. A cached answer is yielded in one piece. Errors are only retried
+    before the first token; the full answer is cached once the stream completes.
+    If a `status` dict is given, status["complete"] is set to True only when a whole
+    answer was yielded (not on FAILED_RESPONSE or an interrupted stream).
+    """
+    if status is not None:
+        status["complete"] = False
+    use_cache = use_cache and LLM_CACHE_ENABLED
+    key = llm_cache_key(messages, model) if use_cache else None
+    if use_cache and not refresh:
+        cached = _LLM_CACHE.get(key)
+        if cached is not None:
+            yield cached.decode("utf-8")
+            if status is not None:
+                status["complete"] = True
+            return
+
+    for attempt in range(1, MAX_RETRIES + 1):
+        parts = []
+        try:
+            for chunk in ollama.chat(model=model, messages=messages, stream=True):
+                token = chunk['message']['content']
+                if not parts:
+                    token = token.lstrip()
+                    if not token:
+                        continue
+                parts.append(token)
+                yield token
+        except Exception as e:
+            if parts:
+                print(f"Stream interrupted after {len(parts)} tokens: {e}")
+                return  # partial answer already shown; not cached
+            print(f"Retry {attempt} failed: {e}")
+            time.sleep(RETRY_DELAY)
+            continue
+        content = "".join(parts).strip()
+        if use_cache and content:
+            _LLM_CACHE.set(key, content.encode("utf-8"))
+        if status is not None:
+            status["complete"] = bool(content)
+        return
+    yield FAILED_RESPONSE
+
 # --- ask_llm: Ultra professional structured due diligence answer ---
-def ask_llm(question, context):
+def check_answer_context(context):
+    """Return a warning if the context is too thin to answer from, else None."""
     if not context.strip():
         return "⚠️ No context available to generate an answer."
     if len(context.strip()) < 50:
         return "⚠️ Context too small to generate an answer."
+    return None
 
+def build_answer_messages(question, context):
     system_prompt = f"""
 You are a Senior Crypto Fund Due Diligence Analyst specializing in audit-grade reports.
 
@@ -93,16 +177,32 @@ Context:
 Question:
 {question}
 """
-    messages = [
+    return [
         {"role": "system", "content": "You are an AI specialized in Crypto Fund Due Diligence reports."},
         {"role": "user", "content": system_prompt.strip()}
     ]
-    return retry_llm(messages)
+
+def ask_llm(question, context, use_cache=True, refresh=False):
+    warning = check_answer_context(context)
+    if warning:
+        return warning
+    return retry_llm(build_answer_messages(question, context), use_cache=use_cache, refresh=refresh)
+
+def ask_llm_stream(question, context, use_cache=True, refresh=False, status=None):
+    """Streaming ask_llm: yields answer tokens as they are generated (see retry_llm_stream for `status`)."""
+    warning = check_answer_context(context)
+    if warning:
+        if status is not None:
+            status["complete"] = False
+        yield warning
+        return
+    yield from retry_llm_stream(build_answer_messages(question, context), use_cache=use_cache,
+                                refresh=refresh, status=status)
 
 # --- ask_llm_raw: Simple freeform prompting ---
-def ask_llm_raw(prompt):
+def ask_llm_raw(prompt, use_cache=True, refresh=False):
     messages = [{"role": "user", "content": prompt}]
-    return retry_llm(messages)
+    return retry_llm(messages, use_cache=use_cache, refresh=refresh)
 # --- Investor Risk Impact Evaluator ---
 def evaluate_investor_risk(answer: str) -> str:
     """
@@ -466,12 +566,21 @@ NO extra explanation or text.
     # --- Faithfulness Checker
 # scripts/llm_responder.py
 
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
 import numpy as np
 
-# --- Load Embedding Model (do it only once)
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')  # Lightweight, fast, good accuracy
+# --- Embedding Model (loaded once, on the first faithfulness check) ---
+FAITHFULNESS_MODEL = 'all-MiniLM-L6-v2'  # Lightweight, fast, good accuracy
+_EMBEDDING_MODEL = None
+
+def get_embedding_model():
+    """sentence-transformers (and torch) take seconds to import, so only pay for them when needed."""
+    global _EMBEDDING_MODEL
+    if _EMBEDDING_MODEL is None:
+        from sentence_transformers import SentenceTransformer
+        import torch
+        _ = torch.classes  # Fix for PyTorch + Streamlit runtime issue
+        _EMBEDDING_MODEL = SentenceTransformer(FAITHFULNESS_MODEL)
+    return _EMBEDDING_MODEL
 
 def check_faithfulness(context, answer, similarity_threshold=0.7):
     """
@@ -491,7 +600,10 @@ def check_faithfulness(context, answer, similarity_threshold=0.7):
             'explanation': "❌ No sufficient context or answer provided."
         }
 
+    from sklearn.metrics.pairwise import cosine_similarity
+
     # Compute embeddings
+    embedding_model = get_embedding_model()
     context_embedding = embedding_model.encode([context], normalize_embeddings=True)
     answer_embedding = embedding_model.encode([answer], normalize_embeddings=True)
 
@@ -1,10 +1,7 @@
-import spacy
 import numpy as np
 import pandas as pd
 from collections import defaultdict
-
-# Load spaCy model
-nlp = spacy.load("en_core_web_sm")
+from lib.nlp_models import parse, VECTOR_PIPES
 
 # Due diligence criteria for analysis
 DUE_DILIGENCE_CRITERIA = {
@@ -44,7 +41,6 @@ IMPORTANCE_WEIGHTS = {
 
 def detect_negative_sentiment(text):
     """Detect negative sentiment in text based on predefined indicators."""
-    doc = nlp(text.lower())
     negative_indicators = ["not mentioned", "lacking", "insufficient", "unavailable", "no details", "unknown", "weak", "incomplete"]
     return any(indicator in text.lower() for indicator in negative_indicators)
 
@@ -52,10 +48,10 @@ def analyze_tag_text(tag, findings, issues):
     """Analyze text for a tag to calculate completeness based on criteria."""
     tag_text = " ".join(findings) + " " + " ".join(issues)
     criteria = DUE_DILIGENCE_CRITERIA.get(tag, [])
-    doc = nlp(tag_text.lower())
+    doc = parse(tag_text.lower(), keep=VECTOR_PIPES)
     found_criteria = []
     for criterion in criteria:
-        criterion_doc = nlp(criterion.lower())
+        criterion_doc = parse(criterion.lower(), keep=VECTOR_PIPES)
         similarity = doc.similarity(criterion_doc)
         keyword_match = criterion.lower() in tag_text.lower()
         if similarity >= 0.7 or keyword_match:
@@ -1,18 +1,22 @@
 import re
+from itertools import islice
 import numpy as np
-import ollama
 from tqdm import tqdm
-from sklearn.metrics.pairwise import cosine_similarity
-from lib.mongo_helpers import update_fund_field, get_all_funds_with_raw_text
+from lib.mongo_helpers import replace_fund_chunks, get_extracted_fund_names, iter_fund_pages
+from lib.embedding_client import embed_texts
 
 
-OLLAMA_MODEL = "nomic-embed-text"
 SIMILARITY_THRESHOLD = 0.5
 CHUNK_TOKEN_LIMIT = 700
 MIN_TOKENS = 10  # Minimum tokens to keep a chunk
+CHUNK_WINDOW_SENTENCES = 2048  # sentences embedded and chunked at a time; must exceed what one chunk can hold
 
 # --- Functions ---
 
+def count_tokens(text):
+    """Approximate token count used for chunk sizing."""
+    return int(len(text.split()) * 1.3)
+
 def split_into_sentences(text):
     """Split text into sentences based on punctuation."""
     sentence_endings = re.compile(r'(?<=[.!?])\s+')
@@ -20,74 +24,112 @@ def split_into_sentences(text):
     return [s.strip() for s in sentences if s.strip()]
 
 def get_embeddings(sentences):
-    """Generate embeddings for a list of sentences."""
-    embeddings = []
-    for sentence in sentences:
-        response = ollama.embeddings(
-            model=OLLAMA_MODEL,
-            prompt=sentence
-        )
-        embeddings.append(response["embedding"])
-    return np.array(embeddings, dtype="float32")
-
-def chunk_semantically(sentences, embeddings):
-    """Group sentences into chunks based on semantic similarity."""
+    """Generate embeddings for a list of sentences (batched float32 matrix)."""
+    return embed_texts(sentences)
+
+def adjacent_similarities(embeddings):
+    """Cosine similarity of every sentence with the previous one (index 0 is always 1.0)."""
+    emb = np.asarray(embeddings, dtype="float32")
+    if len(emb) == 0:
+        return np.empty(0, dtype="float32")
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    unit = np.divide(emb, norms, out=np.zeros_like(emb), where=norms > 0)  # zero vectors -> similarity 0
+    sims = np.ones(len(emb), dtype="float32")
+    sims[1:] = np.einsum("ij,ij->i", unit[1:], unit[:-1])
+    return sims
+
+def chunk_spans(sentences, embeddings):
+    """(start, end) sentence ranges of the semantic chunks, including ones too short to keep."""
     if not sentences:
         return []
 
-    chunks = []
-    current_chunk = []
-    current_tokens = 0
-
-    for i in range(len(sentences)):
-        if current_chunk:
-            sim = cosine_similarity(
-                embeddings[i].reshape(1, -1),
-                embeddings[i-1].reshape(1, -1)
-            )[0][0]
-        else:
-            sim = 1.0  # Always start new chunk with 100% similarity
+    n = len(sentences)
+    sims = adjacent_similarities(embeddings[:n])
+    tokens = np.fromiter((count_tokens(s) for s in sentences), dtype=np.int64, count=n)
+    cum_tokens = np.concatenate(([0], np.cumsum(tokens)))
 
-        sentence_tokens = int(len(sentences[i].split()) * 1.3)  # Approximate token count
+    # Semantic breakpoints split the document into segments...
+    bounds = np.flatnonzero(sims < SIMILARITY_THRESHOLD)
+    bounds = np.concatenate(([0], bounds[bounds > 0], [n]))
 
-        if sim < SIMILARITY_THRESHOLD or current_tokens + sentence_tokens > CHUNK_TOKEN_LIMIT:
-            if current_chunk:
-                chunk_text = " ".join(current_chunk)
-                if len(chunk_text.split()) >= MIN_TOKENS:
-                    chunks.append(chunk_text)
-            current_chunk = []
-            current_tokens = 0
+    # ...and each segment is cut greedily wherever the token limit would be exceeded.
+    spans = []
+    for seg_start, seg_end in zip(bounds[:-1], bounds[1:]):
+        start = int(seg_start)
+        while start < seg_end:
+            end = np.searchsorted(cum_tokens, cum_tokens[start] + CHUNK_TOKEN_LIMIT, side="right") - 1
+            end = int(min(max(end, start + 1), seg_end))  # a chunk always takes at least one sentence
+            spans.append((start, end))
+            start = end
 
-        current_chunk.append(sentences[i])
-        current_tokens += sentence_tokens
+    return spans
 
-    if current_chunk:
-        chunk_text = " ".join(current_chunk)
+def chunk_semantically(sentences, embeddings):
+    """Group sentences into chunks based on semantic similarity."""
+    chunks = []
+    for start, end in chunk_spans(sentences, embeddings):
+        chunk_text = " ".join(sentences[start:end])
         if len(chunk_text.split()) >= MIN_TOKENS:
             chunks.append(chunk_text)
-
     return chunks
 
-def main():
-    print("🔄 Fetching documents from MongoDB...")
-
-    funds = get_all_funds_with_raw_text()
-    print(f"📄 Found {len(funds)} funds with raw text.")
-
-    for fund in tqdm(funds, desc="🔪 Chunking funds"):
-        fund_name = fund["fund_name"]
-        text = fund.get("raw_text", "")
-
-        sentences = split_into_sentences(text)
+def iter_page_sentences(pages):
+    for page_number, text in pages:
+        for sentence in split_into_sentences(text):
+            yield page_number, sentence
+
+def chunk_pages(pages, window=CHUNK_WINDOW_SENTENCES):
+    """
+    Chunk a stream of (page_number, text) pages into {"text", "token_count", "page_start", "page_end"}.
+    Sentences are embedded and chunked `window` at a time. The last chunk of a window may be
+    unfinished, so its sentences (and their embeddings) are carried into the next window;
+    the chunks are the same as chunking all the sentences at once.
+    """
+    stream = iter_page_sentences(pages)
+    page_numbers, sentences, embeddings = [], [], None
+    while True:
+        wanted = window - len(sentences)
+        new = list(islice(stream, wanted))
+        final = len(new) < wanted
+        if new:
+            page_numbers += [page_number for page_number, _ in new]
+            sentences += [sentence for _, sentence in new]
+            vectors = get_embeddings([sentence for _, sentence in new])
+            embeddings = vectors if embeddings is None else np.concatenate([embeddings, vectors])
         if not sentences:
-            print(f"⚠️ No sentences found in {fund_name}")
-            continue
+            return
+
+        spans = chunk_spans(sentences, embeddings)
+        keep = len(sentences) if final or spans[-1][0] == 0 else spans[-1][0]
+        for start, end in spans:
+            if start >= keep:
+                break
+            chunk_text = " ".join(sentences[start:end])
+            if len(chunk_text.split()) >= MIN_TOKENS:
+                yield {
+                    "text": chunk_text,
+                    "token_count": count_tokens(chunk_text),
+                    "page_start": page_numbers[start],
+                    "page_end": page_numbers[end - 1]
+                }
+        if final:
+            return
+        page_numbers, sentences, embeddings = page_numbers[keep:], sentences[keep:], embeddings[keep:]
+
+def main(fund_names=None):
+    """Chunk every fund with raw text, or only the given fund_names (e.g. freshly uploaded ones)."""
+    print("🔄 Fetching documents from MongoDB...")
 
-        embeddings = get_embeddings(sentences)
-        chunks = chunk_semantically(sentences, embeddings)
+    fund_names = get_extracted_fund_names(fund_names)
+    print(f"📄 Found {len(fund_names)} funds with extracted text.")
 
-        update_fund_field(fund_name, "cleaned_chunks", chunks)
-        print(f"✅ Chunks saved for {fund_name}")
+    for fund_name in tqdm(fund_names, desc="🔪 Chunking funds"):
+        # Pages stream from MongoDB through chunking back into MongoDB
+        n_chunks = replace_fund_chunks(fund_name, chunk_pages(iter_fund_pages(fund_name)))
+        if n_chunks:
+            print(f"✅ {n_chunks} chunks saved for {fund_name}")
+        else:
+            print(f"⚠️ No chunks found in {fund_name}")
 
 # --- Entry Point ---
 if __name__ == "__main__":
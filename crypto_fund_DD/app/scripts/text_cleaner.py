@@ -0,0 +1,155 @@
+# --- text_cleaner.py (single-pass, streaming raw text cleaner) ---
+#
+# Applies exactly the same rules as the original multi-pass clean_text, but every rule is
+# compiled once and the text flows through all of them as a chain of generators, in blocks
+# of whole lines (BLOCK_CHARS at a time). Rules whose regex can run across a line break
+# (page markers, date lines, bullets, numbering, blank-line runs) hold back only the last
+# few lines of a block that a match could still extend, and finish them with the next block.
+
+import re
+import unicodedata
+from itertools import groupby
+
+BLOCK_CHARS = 1 << 16  # ~64K characters of whole lines per block
+
+# --- Compiled rules ---
+# Same matches as the original clean_text patterns; a few are rewritten so the regex engine
+# can skip ahead to a literal or a first character instead of trying every position.
+PAGE_MARKER = re.compile(r"(page\s*\d+(\s*of\s*\d+)?)", re.IGNORECASE)
+PAGE_MARKER_OPEN = re.compile(r"page\s*(?:\d+\s*(?:of\s*)?)?\Z", re.IGNORECASE)  # may continue on the next line
+BOILERPLATE = re.compile(r"(?=[cpi])(?:confidential|proprietary|internal use only)", re.IGNORECASE)
+SHORT_LINE = re.compile(r'(?m)^[^\n]{1,20}\n')
+DATE_LINE = re.compile(r'(?m)^\s*(\d{1,2}([-/]\d{1,2}){1,2})\s*$')
+DATE_OR_BLANK_LINE = re.compile(r'\s*(\d{1,2}([-/]\d{1,2}){1,2})?\s*')
+DECORATION = re.compile(r'[_*\-=~•■◆►¤✦●⚫️★☆]+')
+BULLET = re.compile(r'^[\s]*[\-\*•➤►▪️•⚫️●>]+[\s]+', re.MULTILINE)
+BULLET_OR_BLANK_LINE = re.compile(r'[\s]*[\-\*•➤►▪️•⚫️●>]*[\s]*')
+NUMBERING = re.compile(r'^(\d+)\.\s*', re.MULTILINE)
+NUMBERING_OR_BLANK_LINE = re.compile(r'(\d+\.)?\s*')
+BLANK_RUN = re.compile(r'\n\n\n+')  # \n{3,}
+NUMBER_BEFORE_CAPITAL = re.compile(r'\.(?<=\d\.)(?=[A-Z])')  # (\d+)\.([A-Z]) -> \1. \2
+INNER_SPACES = re.compile(r'[ \t][ \t]+')  # [ \t]{2,}
+
+# --- Block plumbing ---
+def iter_line_blocks(pieces, block_chars=BLOCK_CHARS):
+    """Re-cut text pieces (a whole document, pages, file reads...) into blocks that end on a line break."""
+    carry = ""
+    for piece in pieces:
+        text = carry + piece if carry else piece
+        start = 0
+        while len(text) - start >= block_chars:
+            cut = text.rfind("\n", start, start + block_chars) + 1
+            if cut <= start:  # one line longer than a block
+                cut = text.find("\n", start + block_chars) + 1
+                if not cut:
+                    break
+            yield text[start:cut]
+            start = cut
+        carry = text[start:]
+    if carry:
+        yield carry
+
+def _hold_back(blocks, process, safe_cut):
+    """
+    Run process() on each block up to the last position safe_cut() allows (no match can run
+    across it); the remainder is prepended to the next block.
+    """
+    carry = ""
+    for block in blocks:
+        text = carry + block if carry else block
+        cut = safe_cut(text)
+        if cut:
+            yield process(text[:cut])
+        carry = text[cut:]
+    if carry:
+        yield process(carry)
+
+def _cut_after_closed_line(is_open):
+    """Safe cut = just after the last complete line that a match cannot run past."""
+    def safe_cut(text):
+        end = text.rfind("\n")
+        while end >= 0:
+            start = text.rfind("\n", 0, end) + 1
+            if not is_open(text, start, end):
+                return end + 1
+            end = start - 1
+        return 0
+    return safe_cut
+
+def _page_marker_cut(text):
+    end = text.rfind("\n")
+    while end >= 0 and PAGE_MARKER_OPEN.search(text, 0, end):
+        end = text.rfind("\n", 0, end)
+    return end + 1
+
+def _blank_run_cut(text):
+    """Cut on a single newline between two non-empty lines, so no run of newlines is split."""
+    end = len(text) - 1
+    while True:
+        end = text.rfind("\n", 0, end)
+        if end <= 0:
+            return 0
+        if text[end - 1] != "\n" and text[end + 1] != "\n":
+            return end + 1
+
+# --- Stages ---
+def _remove_page_markers(text):
+    return BOILERPLATE.sub("", PAGE_MARKER.sub("", text))
+
+def _dedupe_lines(blocks):
+    """str.splitlines() (also splits on \\r, \\x0b, \\u2028, ...) and drop consecutive duplicate lines."""
+    previous_line = None
+    for block in blocks:
+        lines = [line for line, _ in groupby(block.splitlines())]
+        if lines and lines[0] == previous_line:
+            del lines[0]
+        if lines:
+            previous_line = lines[-1]
+            yield "\n".join(lines) + "\n"
+
+def _tidy_spaces(text):
+    text = NUMBER_BEFORE_CAPITAL.sub('. ', text)
+    text = "\n".join([line.strip(" \t") for line in text.split("\n")])  # (?m)^[ \t]+ and (?m)[ \t]+$
+    return INNER_SPACES.sub(' ', text)
+
+def _strip_document(blocks):
+    """str.strip() of the joined blocks, without joining them."""
+    started = False
+    trailing = ""
+    for block in blocks:
+        if not started:
+            block = block.lstrip()
+            if not block:
+                continue
+            started = True
+        body = block.rstrip()
+        if body:
+            yield trailing + body
+            trailing = block[len(body):]
+        else:
+            trailing += block
+
+# --- Public API ---
+def iter_clean_blocks(pieces):
+    """
+    Clean a stream of raw text pieces and yield cleaned text.
+    "".join() of the output equals the original clean_text("".join(pieces)).
+    """
+    blocks = iter_line_blocks(pieces)
+    blocks = (unicodedata.normalize("NFKD", block) for block in blocks)
+    blocks = _hold_back(blocks, _remove_page_markers, _page_marker_cut)
+    blocks = (SHORT_LINE.sub('', block) for block in blocks)
+    blocks = _hold_back(blocks, lambda text: DATE_LINE.sub('', text),
+                        _cut_after_closed_line(DATE_OR_BLANK_LINE.fullmatch))
+    blocks = (DECORATION.sub(' ', block) for block in blocks)
+    blocks = _hold_back(blocks, lambda text: BULLET.sub('- ', text),
+                        _cut_after_closed_line(BULLET_OR_BLANK_LINE.fullmatch))
+    blocks = _hold_back(blocks, lambda text: NUMBERING.sub(r'\1. ', text),
+                        _cut_after_closed_line(NUMBERING_OR_BLANK_LINE.fullmatch))
+    blocks = _hold_back(blocks, lambda text: BLANK_RUN.sub('\n\n', text), _blank_run_cut)
+    blocks = _dedupe_lines(blocks)
+    blocks = (_tidy_spaces(block) for block in blocks)
+    return _strip_document(blocks)
+
+def clean_text(raw_text: str) -> str:
+    return "".join(iter_clean_blocks([raw_text]))
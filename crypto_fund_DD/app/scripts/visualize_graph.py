@@ -1,51 +1,183 @@
 # scripts/visualize_graph.py
-import pickle
-import networkx as nx
-from pyvis.network import Network
+import numpy as np
 import streamlit as st
 import streamlit.components.v1 as components
+from lib.graph_store import load_graph
 
-GRAPH_PATH = "data/graph.pkl"
+# --- Level of detail ---
+# Whatever the corpus size, the browser never receives more than MAX_NODES nodes and MAX_EDGES edges.
+MAX_NODES = 150
+MAX_EDGES = 600
+EGO_RADIUS = 2
+COMMUNITY_ITERATIONS = 10    # label propagation rounds
+TITLE_CONCEPTS = 8           # concepts listed in a node's hover text
+VIEWS = ("🔝 Most connected chunks", "🧩 Communities", "🎯 Around a chunk")
 
-def visualize_graph():
-    if not GRAPH_PATH or not GRAPH_PATH.endswith('.pkl'):
-        st.error("⚠️ Invalid graph path.")
-        return
+_COMMUNITIES = {}            # graph version path -> community view at MAX_NODES, sliced for smaller budgets
 
-    try:
-        with open(GRAPH_PATH, "rb") as f:
-            G = pickle.load(f)
-    except Exception as e:
-        st.error(f"❌ Failed to load graph: {e}")
-        return
+# --- Sampling (server side) ---
+def top_degree_rows(graph, max_nodes=MAX_NODES):
+    """Rows of the max_nodes best-connected chunks."""
+    degrees = graph.degrees()
+    if len(degrees) <= max_nodes:
+        return np.arange(len(degrees))
+    rows = np.argpartition(-degrees, max_nodes - 1)[:max_nodes]
+    return rows[np.argsort(-degrees[rows], kind="stable")]
 
-    if G.number_of_nodes() == 0:
-        st.warning("⚠️ Graph is empty. Nothing to visualize.")
-        return
-    
-    st.success(f"✅ Loaded graph with {G.number_of_nodes()} nodes and {G.number_of_edges()} edges.")
+def ego_rows(graph, center, radius=EGO_RADIUS, max_nodes=MAX_NODES):
+    """Rows within `radius` hops of center, nearest and strongest first, up to max_nodes."""
+    rows, seen = [center], {center}
+    frontier = [center]
+    for _ in range(radius):
+        reached = []
+        for row in frontier:
+            for neighbour in graph.neighbours(row)[0]:
+                if len(rows) >= max_nodes:
+                    return np.array(rows)
+                if neighbour not in seen:
+                    seen.add(neighbour)
+                    rows.append(neighbour)
+                    reached.append(neighbour)
+        frontier = reached
+    return np.array(rows)
+
+def edges_between(graph, rows, max_edges=MAX_EDGES):
+    """(i, j, weight) positions into rows of the strongest edges among the sampled rows."""
+    position = {int(row): i for i, row in enumerate(rows)}
+    edges = []
+    for i, row in enumerate(rows):
+        neighbours, weights = graph.neighbours(row)
+        for neighbour, weight in zip(neighbours, weights):
+            j = position.get(int(neighbour))
+            if j is not None and i < j:
+                edges.append((i, j, float(weight)))
+    edges.sort(key=lambda edge: -edge[2])
+    return edges[:max_edges]
+
+def label_communities(graph, iterations=COMMUNITY_ITERATIONS):
+    """Community label per row by weighted label propagation over the CSR adjacency."""
+    from scipy import sparse
+
+    n = graph.n_nodes
+    rows = np.repeat(np.arange(n), graph.degrees())
+    cols = np.asarray(graph.adj_indices)
+    weights = np.asarray(graph.adj_weights)
+    labels = np.arange(n)
+    for _ in range(iterations):
+        # Each chunk takes the label carrying most edge weight around it (its own label breaks ties)
+        votes = sparse.csr_matrix((np.concatenate([weights, np.full(n, 1e-3, dtype=weights.dtype)]),
+                                   (np.concatenate([rows, np.arange(n)]), np.concatenate([labels[cols], labels]))),
+                                  shape=(n, n))
+        # Row-wise argmax (smallest label on ties): sort each row's entries by weight, take the first
+        vote_rows = np.repeat(np.arange(n), np.diff(votes.indptr))
+        order = np.lexsort((votes.indices, -votes.data, vote_rows))
+        new_labels = votes.indices[order[votes.indptr[:-1]]]
+        if np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+    return labels
+
+def top_concepts(graph, rows, limit=TITLE_CONCEPTS):
+    """Most common concepts among rows; counted by id, only the winners are decoded."""
+    if len(rows) == 0:
+        return []
+    ids = np.concatenate([graph.concept_indices[graph.concept_indptr[row]:graph.concept_indptr[row + 1]] for row in rows])
+    concept_ids, counts = np.unique(ids, return_counts=True)
+    return [graph.concept_names[i] for i in concept_ids[np.argsort(-counts, kind="stable")][:limit]]
+
+def summarize_communities(graph, max_nodes=MAX_NODES, sample_rows=50):
+    """
+    Nodes for the max_nodes largest communities (named after their most common concepts,
+    read from up to sample_rows members) and the summed edge weight between each pair, strongest first.
+    """
+    labels = label_communities(graph)
+    sizes = np.bincount(labels, minlength=graph.n_nodes)
+    communities = np.argsort(-sizes, kind="stable")[:min(max_nodes, np.count_nonzero(sizes))]
+    order = np.argsort(labels, kind="stable")
+    starts = np.searchsorted(labels[order], communities)
+
+    nodes = []
+    for community, start in zip(communities, starts):
+        members = order[start:start + min(sizes[community], sample_rows)]
+        concepts = top_concepts(graph, members)
+        label = concepts[0] if concepts else graph.node_ids[members[0]]
+        title = f"{sizes[community]} chunks<br>" + "<br>".join(concepts)
+        nodes.append((f"community_{community}", label, title, 10 + 4 * np.log1p(sizes[community])))
 
-    # Create a pyvis Network
+    position = np.full(graph.n_nodes, -1)
+    position[communities] = np.arange(len(communities))
+    rows, cols, weights = graph.edges()
+    a, b = position[labels[rows]], position[labels[cols]]
+    between = (a >= 0) & (b >= 0) & (a != b)
+    pair_keys, pair_of_edge = np.unique(np.minimum(a, b)[between] * len(communities) + np.maximum(a, b)[between],
+                                        return_inverse=True)
+    pair_weights = np.bincount(pair_of_edge, weights=weights[between], minlength=len(pair_keys))
+    strongest = np.argsort(-pair_weights, kind="stable")
+    edges = [(int(pair_keys[k] // len(communities)), int(pair_keys[k] % len(communities)), float(pair_weights[k]))
+             for k in strongest]
+    return nodes, edges
+
+# --- Views: (nodes [(id, label, title, size)], edges [(i, j, weight)]) ---
+def chunk_view(graph, rows, max_edges=MAX_EDGES):
+    nodes = []
+    for row in rows:
+        node_id = graph.node_ids[row]
+        nodes.append((node_id, node_id, "<br>".join(graph.concepts(row)[:TITLE_CONCEPTS]) or node_id, 10))
+    return nodes, edges_between(graph, rows, max_edges)
+
+def community_view(graph, max_nodes=MAX_NODES, max_edges=MAX_EDGES):
+    """One node per community (the max_nodes largest), edges weighted by the links between them."""
+    if graph.path not in _COMMUNITIES:
+        _COMMUNITIES.clear()  # only the current graph version is ever shown
+        _COMMUNITIES[graph.path] = summarize_communities(graph)
+    nodes, edges = _COMMUNITIES[graph.path]
+    nodes = nodes[:max_nodes]
+    return nodes, [edge for edge in edges if edge[1] < len(nodes)][:max_edges]
+
+# --- Rendering ---
+def render(nodes, edges):
+    from pyvis.network import Network
     net = Network(height="750px", width="100%", bgcolor="#222222", font_color="white", notebook=False)
 
     # Set better physics layout
     net.barnes_hut()
 
-    # Add nodes and edges
-    for node, data in G.nodes(data=True):
-        label = node  # You can customize label here if needed
-        title = "<br>".join(data.get("concepts", [])) if "concepts" in data else node
-        net.add_node(node, label=label, title=title)
+    for node_id, label, title, size in nodes:
+        net.add_node(node_id, label=label, title=title, size=float(size))
+    for i, j, weight in edges:
+        net.add_edge(nodes[i][0], nodes[j][0], value=weight)
+
+    # The HTML goes straight to the page, no temporary file
+    components.html(net.generate_html(), height=800, width=1000)
+
+def visualize_graph():
+    try:
+        graph = load_graph()
+    except Exception as e:
+        st.error(f"❌ Failed to load graph: {e}")
+        return
+
+    if graph is None or graph.n_nodes == 0:
+        st.warning("⚠️ Graph is empty. Nothing to visualize.")
+        return
 
-    for source, target in G.edges():
-        net.add_edge(source, target)
+    st.success(f"✅ Loaded graph with {graph.n_nodes} nodes and {graph.n_edges} edges.")
 
-    # Save the graph to a temporary HTML file
-    path = "data/graph.html"
-    net.write_html(path)
+    view = st.radio("View", VIEWS, horizontal=True, key="graph_view")
+    max_nodes = st.slider("Max nodes", 10, MAX_NODES, min(100, MAX_NODES), key="graph_max_nodes")
 
+    if view == VIEWS[1]:
+        nodes, edges = community_view(graph, max_nodes)
+    elif view == VIEWS[2]:
+        default = graph.node_ids[top_degree_rows(graph, 1)[0]]
+        chunk_id = st.text_input("Chunk id", value=default, key="graph_center")
+        center = graph.index_of(chunk_id.strip())
+        if center < 0:
+            st.warning(f"⚠️ No chunk '{chunk_id}' in the graph.")
+            return
+        nodes, edges = chunk_view(graph, ego_rows(graph, center, max_nodes=max_nodes))
+    else:
+        nodes, edges = chunk_view(graph, top_degree_rows(graph, max_nodes))
 
-    # Display the HTML inside Streamlit
-    HtmlFile = open(path, 'r', encoding='utf-8')
-    source_code = HtmlFile.read()
-    components.html(source_code, height=800, width=1000)
+    st.caption(f"Showing {len(nodes)} nodes and {len(edges)} edges.")
+    render(nodes, edges)